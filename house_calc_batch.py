@@ -0,0 +1,231 @@
+"""Headless batch evaluation of saved scenarios to CSV or Parquet"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from house_calc_engine import (SCENARIO_KEYS, compute_schedule, contract_terms, evaluate_batch, scenario_key,
+                               schedule_metrics, stack_scenarios)
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+# Output columns: the Cost Summary box and comparison window figures, plus timing metrics
+COLUMNS = (
+    'name',
+    'raw_house_cost',
+    'down_payment',
+    'mortgage_rate',
+    'loan_period',
+    'loan_amount',
+    'misc_costs',
+    'upfront_costs',
+    'monthly_repayment',
+    'yearly_repayment',
+    'total_interest',
+    'extra_cost',
+    'extra_cost_perc',
+    'effective_cost',
+    'payoff_month',
+    'breakeven_month',
+)
+
+
+def iter_scenarios(paths):
+    """Yield (name, scenario) pairs from scenario files, SQLite stores or directories of JSON files.
+
+    A JSON file in a directory may hold either a {name: scenario} mapping or a single scenario,
+    which is then named after the file.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for filename in sorted(os.listdir(path)):
+                if filename.endswith('.json'):
+                    yield from _iter_json(os.path.join(path, filename))
+        elif path.endswith('.json'):
+            yield from _iter_json(path)
+        else:
+            with open_store(path) as store:
+                for name in store:
+                    yield name, store[name]
+
+
+def _iter_json(path):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if all(key in data for key in SCENARIO_KEYS):
+        yield os.path.splitext(os.path.basename(path))[0], data
+    else:
+        yield from data.items()
+
+
+def evaluate_chunk(names, scenarios):
+    """Summary rows of a chunk of scenarios, as a dictionary of columns"""
+    params = stack_scenarios(scenarios)
+    metrics = evaluate_batch(params)
+    # Scenarios with contract terms (rate resets, extra payments, ...) are computed one by one
+    for i, scenario in enumerate(scenarios):
+        if contract_terms(scenario):
+            for key, value in schedule_metrics(compute_schedule(scenario)).items():
+                metrics[key][i] = value
+    columns = {'name': list(names)}
+    for key in COLUMNS[1:]:
+        if key == 'extra_cost_perc':
+            columns[key] = metrics['extra_cost'] * 100 / params['raw_house_cost']
+        elif key in metrics:
+            columns[key] = metrics[key]
+        else:
+            columns[key] = params[key]
+    columns['loan_period'] = columns['loan_period'].astype(int)
+    return columns
+
+
+def run_batch(scenarios, writer, chunk_size=2000, processes=None):
+    """Evaluate (name, scenario) pairs in parallel chunks and pass each result chunk to writer.
+
+    Chunks are read lazily and results are written in input order as soon as they are ready.
+    Returns the number of scenarios evaluated.
+    """
+    chunks = _chunks(scenarios, chunk_size)
+    count = 0
+    if processes == 1:
+        for names, chunk in chunks:
+            writer(evaluate_chunk(names, chunk))
+            count += len(names)
+        return count
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # Keep a bounded number of chunks in flight so huge inputs are never fully in memory
+        max_in_flight = 2 * (processes or os.cpu_count() or 1)
+        in_flight = []
+        for names, chunk in chunks:
+            in_flight.append(executor.submit(evaluate_chunk, names, chunk))
+            if len(in_flight) >= max_in_flight:
+                columns = in_flight.pop(0).result()
+                writer(columns)
+                count += len(columns['name'])
+        for future in in_flight:
+            columns = future.result()
+            writer(columns)
+            count += len(columns['name'])
+    return count
+
+
+class SummaryCache:
+    """Summary rows (COLUMNS) of named scenarios, kept across calls.
+
+    rows() evaluates only new or changed scenarios, all of them in one batch, so refreshing
+    a table of hundreds of scenarios after one was saved costs a single-row evaluation.
+    """
+
+    def __init__(self):
+        self._rows = {}
+
+    def rows(self, scenarios):
+        """{name: row} for a mapping of scenario name to scenario; forgets names not in it"""
+        keys = {name: scenario_key(scenario) for name, scenario in scenarios.items()}
+        stale = [name for name, key in keys.items() if name not in self._rows or self._rows[name][0] != key]
+        if stale:
+            columns = evaluate_chunk(stale, [scenarios[name] for name in stale])
+            for i, name in enumerate(stale):
+                row = {key: columns[key][i] for key in COLUMNS}
+                row['name'] = name
+                self._rows[name] = (keys[name], row)
+        for name in set(self._rows) - set(keys):
+            del self._rows[name]
+        return {name: self._rows[name][1] for name in keys}
+
+
+def _chunks(scenarios, chunk_size):
+    scenarios = iter(scenarios)
+    while True:
+        chunk = list(itertools.islice(scenarios, chunk_size))
+        if not chunk:
+            return
+        names, bodies = zip(*chunk)
+        yield names, bodies
+
+
+class CsvWriter:
+    """Stream result chunks to a CSV file"""
+
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(COLUMNS)
+
+    def __call__(self, columns):
+        rows = zip(*[_format_column(columns[key]) for key in COLUMNS])
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    """Stream result chunks as row groups of a Parquet file (requires pyarrow)"""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pyarrow = pyarrow
+        self.writer = None
+        self.path = path
+        self.parquet = pyarrow.parquet
+
+    def __call__(self, columns):
+        table = self.pyarrow.table({key: columns[key] for key in COLUMNS})
+        if self.writer is None:
+            self.writer = self.parquet.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _format_column(values):
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        return [f"{value:.2f}" for value in values]
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate saved scenarios without the GUI")
+    parser.add_argument('inputs', nargs='*', default=[DEFAULT_SCENARIO_FILE],
+                        help="Scenario files (.json), stores (.db, .sqlite) or directories of .json files")
+    parser.add_argument('-o', '--output', default='-', help="Output file (.csv or .parquet), - for CSV on stdout")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="Scenarios per worker task")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.output.endswith('.parquet'):
+        try:
+            writer = ParquetWriter(args.output)
+        except RuntimeError as e:
+            parser.error(str(e))
+        output = None
+    else:
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+        writer = CsvWriter(output)
+
+    try:
+        count = run_batch(iter_scenarios(args.inputs), writer, args.chunk_size, args.processes)
+    finally:
+        writer.close()
+        if output is not None and output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {count} scenarios in {elapsed:.2f}s ({count / elapsed:,.0f} scenarios/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Reproducible benchmarks of the calculation, rendering and scenario I/O hot paths"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from house_calc_engine import compute_schedule, evaluate_batch, scenario_grid
+from house_calc_store import JsonScenarioStore, SqliteScenarioStore
+
+# The GUI's default inputs
+DEFAULT_SCENARIO = {
+    'raw_house_cost': 350000.0,
+    'mortgage_rate': 3.8,
+    'yearly_repayment': 5.0,
+    'nebenkosten': 400.0,
+    'inflation': 2.7,
+    'house_inflation': 2.7,
+    'loan_period': 30,
+    'down_payment': 35000.0,
+    'broker_commission': 3.57,
+    'notary': 1.5,
+    'land_registry': 0.5,
+    'land_transfer_tax': 5.0,
+    'monthly_rent': 1300.0,
+}
+
+# Inputs that used to make the principal correction loop spin or fail
+ADVERSARIAL_SCENARIOS = {
+    'tiny_loan_large_repayment': dict(DEFAULT_SCENARIO, down_payment=349000.0, yearly_repayment=10.0),
+    'no_special_repayment_50y': dict(DEFAULT_SCENARIO, yearly_repayment=0.0, loan_period=50),
+    'zero_rate': dict(DEFAULT_SCENARIO, mortgage_rate=0.0),
+    'fully_paid_upfront': dict(DEFAULT_SCENARIO, down_payment=350000.0),
+}
+
+
+def timeit(func, repeat=20, number=1):
+    """Per-call wall times in milliseconds of repeat rounds of number calls, after one warm-up call"""
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) * 1000. / number)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times), 'repeat': repeat, 'number': number}
+
+
+def bench_schedule(results):
+    for loan_period in (10, 20, 30, 40, 50):
+        scenario = dict(DEFAULT_SCENARIO, loan_period=loan_period)
+        results[f'schedule/{loan_period}y'] = timeit(lambda: compute_schedule(scenario), number=20)
+    # Contract terms: a rate reset with extra payments, monthly and daily
+    contract = dict(DEFAULT_SCENARIO, rate_segments=[[10, 5.5]], extra_payments=[[5, 20000]], special_repayment_cap=20000)
+    results['schedule/contract_monthly'] = timeit(lambda: compute_schedule(contract), number=20)
+    daily = dict(contract, periods_per_year=365)
+    results['schedule/contract_daily'] = timeit(lambda: compute_schedule(daily), number=20)
+
+
+def bench_payoff(results):
+    for name, scenario in ADVERSARIAL_SCENARIOS.items():
+        results[f'payoff/{name}'] = timeit(lambda: compute_schedule(scenario), number=20)
+
+
+def bench_batch(results):
+    grid = scenario_grid(DEFAULT_SCENARIO, mortgage_rate=np.linspace(1, 8, 50), down_payment=np.linspace(0, 1e5, 20),
+                         loan_period=np.arange(10, 51, 10), yearly_repayment=np.linspace(0, 10, 10))
+    results['batch/50000'] = timeit(lambda: evaluate_batch(grid), repeat=5)
+
+
+def bench_optimizer(results):
+    from house_calc_optimizer import optimize_strategy
+    results['optimizer/30y'] = timeit(lambda: optimize_strategy(DEFAULT_SCENARIO, cap=20000), repeat=5)
+    results['optimizer/30y_refinance'] = timeit(
+        lambda: optimize_strategy(DEFAULT_SCENARIO, cap=20000, refinance_rate=2.5, refinance_fee=3000), repeat=5)
+
+
+def bench_portfolio(results, sizes=(2, 12, 48)):
+    from house_calc_portfolio import Portfolio
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        scenarios = [dict(DEFAULT_SCENARIO, raw_house_cost=float(rng.uniform(100000, 800000)),
+                          loan_period=int(rng.integers(10, 36))) for _ in range(size)]
+        names = [f"Property {i}" for i in range(size)]
+        start_months = rng.integers(0, 240, size)
+        results[f'portfolio/{size}'] = timeit(lambda: Portfolio(names, scenarios, start_months))
+
+
+def bench_render(results):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from house_calc_plot import ComparisonPlot, SchedulePlot
+
+    figure = Figure(figsize=(12, 8))
+    FigureCanvasAgg(figure)
+    plot = SchedulePlot(figure)
+    schedules = [compute_schedule(dict(DEFAULT_SCENARIO, raw_house_cost=350000. + 100. * i)) for i in range(2)]
+    state = {'i': 0}
+
+    def update(blit):
+        state['i'] += 1
+        plot.update(schedules[state['i'] % 2], blit=blit)
+
+    results['render/full_update'] = timeit(lambda: update(False), repeat=10)
+    results['render/blit_update'] = timeit(lambda: update(True), repeat=10)
+
+    # Long horizons at daily resolution: the lines are decimated to the axes width
+    schedules[:] = [compute_schedule(dict(DEFAULT_SCENARIO, loan_period=50, periods_per_year=365,
+                                          raw_house_cost=350000. + 100. * i)) for i in range(2)]
+    results['render/full_update_50y_daily'] = timeit(lambda: update(False), repeat=10)
+    results['render/blit_update_50y_daily'] = timeit(lambda: update(True), repeat=10)
+
+    # Comparison overlay of many 50-year curves
+    figure = Figure(figsize=(14, 4))
+    FigureCanvasAgg(figure)
+    overlay = ComparisonPlot(figure)
+    curves = [compute_schedule(dict(DEFAULT_SCENARIO, loan_period=50, raw_house_cost=300000. + 1000. * i))
+              for i in range(500)]
+    names = [f"Scenario {i}" for i in range(len(curves))]
+
+    def draw_overlay():
+        overlay.update(names, curves)
+        figure.canvas.draw()
+
+    results['render/overlay_500'] = timeit(draw_overlay, repeat=5)
+
+
+def bench_comparison(results, sizes=(2, 10, 100, 1000)):
+    # Summary rows as computed for the comparison table, plus the Tk window when a display is available
+    from house_calc_batch import SummaryCache
+
+    for n in sizes:
+        scenarios = {f"Scenario {i}": dict(DEFAULT_SCENARIO, raw_house_cost=300000. + 1000. * i) for i in range(n)}
+        results[f'comparison/compute_{n}'] = timeit(lambda: SummaryCache().rows(scenarios), repeat=5)
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        results['comparison/tk'] = {'skipped': f"no display ({e.__class__.__name__})"}
+        return
+
+    from unittest import mock
+    from new_buy_house_app import HouseCalculatorApp
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            path = os.path.join(directory, f'{n}.json')
+            with open(path, 'w') as f:
+                json.dump({f"Scenario {i}": dict(DEFAULT_SCENARIO, raw_house_cost=300000. + 1000. * i) for i in range(n)}, f)
+            app = HouseCalculatorApp(root, scenario_file=path)
+            app.finish_startup()
+
+            def build():
+                app.compare_scenarios()
+                root.update_idletasks()
+                for child in root.winfo_children():
+                    if isinstance(child, tk.Toplevel):
+                        child.destroy()
+
+            with mock.patch('new_buy_house_app.messagebox'):
+                results[f'comparison/tk_{n}'] = timeit(build, repeat=3)
+            app.main_frame.destroy()
+    root.destroy()
+
+
+def bench_report(results, n=40):
+    # Offscreen pages with one worker and with all cores, to check that rendering scales
+    from house_calc_report import render_reports
+    scenarios = {f"Scenario {i}": dict(DEFAULT_SCENARIO, raw_house_cost=300000. + 1000. * i) for i in range(n)}
+    for processes in sorted({1, os.cpu_count() or 1}):
+        with tempfile.TemporaryDirectory() as directory:
+            results[f'report/{n}_p{processes}'] = timeit(
+                lambda: render_reports(scenarios, directory, processes=processes, comparison=False), repeat=1)
+
+
+def bench_store(results, sizes=(10, 1000, 100000)):
+    scenario = dict(DEFAULT_SCENARIO, timestamp='2025-01-01T00:00:00')
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            scenarios = {f"Scenario {i}": scenario for i in range(n)}
+            repeat = 3 if n >= 100000 else 10
+
+            json_path = os.path.join(directory, f'{n}.json')
+            with open(json_path, 'w') as f:
+                json.dump(scenarios, f, indent=2)
+            results[f'store/json_load_{n}'] = timeit(lambda: dict(JsonScenarioStore(json_path)), repeat=repeat)
+            store = JsonScenarioStore(json_path)
+            results[f'store/json_save_{n}'] = timeit(lambda: store.__setitem__('New', scenario), repeat=repeat)
+
+            db_path = os.path.join(directory, f'{n}.db')
+            with SqliteScenarioStore(db_path) as db:
+                db.import_json(json_path)
+            results[f'store/sqlite_list_{n}'] = timeit(lambda: _list_sqlite(db_path), repeat=repeat)
+            with SqliteScenarioStore(db_path) as db:
+                results[f'store/sqlite_save_{n}'] = timeit(lambda: db.__setitem__('New', scenario), repeat=repeat)
+
+
+def _list_sqlite(path):
+    with SqliteScenarioStore(path) as store:
+        return sorted(store)
+
+
+BENCHMARKS = {
+    'schedule': bench_schedule,
+    'payoff': bench_payoff,
+    'batch': bench_batch,
+    'optimizer': bench_optimizer,
+    'portfolio': bench_portfolio,
+    'render': bench_render,
+    'comparison': bench_comparison,
+    'report': bench_report,
+    'store': bench_store,
+}
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each median against a baseline; returns the names that regressed"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name, {}).get('median_ms')
+        if 'median_ms' not in result or before is None:
+            continue
+        ratio = result['median_ms'] / before
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36} {before:10.3f} -> {result['median_ms']:10.3f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the calculation, rendering and scenario I/O paths")
+    parser.add_argument('benchmarks', nargs='*', default=list(BENCHMARKS),
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('-o', '--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against a previous JSON result file")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Relative slowdown counted as a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.benchmarks:
+        print(f"Running {name} benchmarks...", file=sys.stderr)
+        BENCHMARKS[name](results)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        sys.exit(1 if regressions else 0)
+    if not args.output:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+"""Tk-free amortization engine shared by the GUI, the comparison window and batch jobs"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# The 13 scenario inputs, in the order used by get_current_scenario_data
+SCENARIO_KEYS = (
+    'raw_house_cost',
+    'mortgage_rate',
+    'yearly_repayment',
+    'nebenkosten',
+    'inflation',
+    'house_inflation',
+    'loan_period',
+    'down_payment',
+    'broker_commission',
+    'notary',
+    'land_registry',
+    'land_transfer_tax',
+    'monthly_rent',
+)
+
+# Optional contract terms beyond the 13 inputs. Scenarios without them take the vectorized
+# fixed-rate monthly path; with them the schedule is computed by _amortize_contract.
+CONTRACT_KEYS = (
+    'rate_segments',  # [[start_year, mortgage_rate], ...]: rate resets, the payment is re-amortized
+    'extra_payments',  # [[year, amount], ...]: special repayments on top of yearly_repayment
+    'special_repayment_cap',  # maximum total special repayment per contract year
+    'payment_holidays',  # [[start_year, end_year], ...]: no regular payments, interest accrues
+    'periods_per_year',  # time resolution: 12 (monthly, default), 26, 52 or 365 (daily)
+)
+
+# Time resolutions accepted for periods_per_year: monthly, bi-weekly, weekly and daily
+PERIODS_PER_YEAR = (12, 26, 52, 365)
+
+# Summary metrics returned by evaluate_batch
+BATCH_METRICS = (
+    'loan_amount',
+    'misc_costs',
+    'upfront_costs',
+    'monthly_repayment',
+    'yearly_repayment',
+    'total_interest',
+    'extra_cost',
+    'effective_cost',
+    'payoff_month',
+    'breakeven_month',
+)
+
+
+class Schedule:
+    """Month-by-month schedule of a single scenario, stored as NumPy arrays.
+
+    With a finer periods_per_year the arrays hold one entry per period and months counts
+    fractional months, so the series plot against months as usual.
+    """
+
+    def __init__(self, scenario):
+        self.scenario = {key: scenario[key] for key in SCENARIO_KEYS}
+        terms = contract_terms(scenario)
+        self.scenario.update(terms)
+        params = _as_arrays(self.scenario)
+        costs = _upfront(params)
+        periods_per_year = terms.get('periods_per_year', 12)
+        if periods_per_year not in PERIODS_PER_YEAR:
+            raise ValueError(f"periods_per_year must be one of {', '.join(map(str, PERIODS_PER_YEAR))}, "
+                             f"got {periods_per_year}")
+        self.periods_per_year = int(periods_per_year)
+        n_periods = params['loan_period'] * self.periods_per_year
+        width = int(n_periods[0])
+        if terms:
+            self.months = months = np.arange(1, width + 1) * (12. / self.periods_per_year)
+            repayments, interest_repayment, principle_repayment, payoff_idx, costs['monthly_repayment'] = \
+                _amortize_contract(params, costs, terms, self.periods_per_year, width)
+        else:
+            self.months = months = np.arange(1, width + 1, dtype=float)
+            repayments, interest_repayment, principle_repayment, payoff_idx = _amortize(
+                params, costs, n_periods, width)
+
+        self.raw_house_cost = float(params['raw_house_cost'][0])
+        self.down_payment = float(params['down_payment'][0])
+        self.nebenkosten = float(params['nebenkosten'][0])
+        self.misc_costs = float(costs['misc_costs'][0])
+        self.upfront_costs = float(costs['upfront_costs'][0])
+        self.loan_amount = float(costs['loan_amount'][0])
+        self.yearly_repayment = float(costs['yearly_repayment'][0])
+        self.monthly_repayment = float(costs['monthly_repayment'][0])
+
+        self.repayments = repayments[0]
+        self.interest_repayment = interest_repayment[0]
+        self.principle_repayment = principle_repayment[0]
+        self.payoff_idx = int(payoff_idx[0])
+        self.total_repayment = self.interest_repayment + self.principle_repayment
+
+        self.cumulative_interest = np.cumsum(self.interest_repayment)
+        self.cumulative_principle = np.cumsum(self.principle_repayment)
+        self.total_interest = float(self.cumulative_interest[-1])
+        self.extra_cost = self.misc_costs + self.total_interest
+        self.effective_cost = self.extra_cost + self.raw_house_cost
+
+        # Renting vs. owning
+        rent = _rent_vs_buy(params, costs, interest_repayment, principle_repayment, months)
+        self.cumulative_rent = rent['cumulative_rent'][0]
+        self.other_costs = rent['other_costs'][0]
+        self.house_valuation = rent['house_valuation'][0]
+        self.owed_to_bank = rent['owed_to_bank'][0]
+        self.total_cumulative_costs = rent['total_cumulative_costs'][0]
+        self.profit = rent['profit'][0]
+        self.breakeven_idx = int(_breakeven_idx(rent, n_periods)[0])
+
+    @property
+    def extra_cost_perc(self):
+        return self.extra_cost * 100 / self.raw_house_cost
+
+
+def annuity_payment(loan_amount, mortgage_rate, loan_period, periods_per_year=12):
+    """Constant payment per period (monthly by default) that amortizes loan_amount over loan_period years"""
+    monthly_rate = np.asarray(mortgage_rate, dtype=float) / 100. / periods_per_year
+    n_months = periods_per_year * np.asarray(loan_period, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(monthly_rate == 0, loan_amount / n_months,
+                           loan_amount * monthly_rate / (1 - (1 + monthly_rate) ** (-n_months)))
+    return payment if payment.ndim else float(payment)
+
+
+def compute_schedule(scenario):
+    """Compute the full schedule for a scenario dictionary (extra keys such as timestamp are ignored)"""
+    return Schedule(scenario)
+
+
+def scenario_key(scenario):
+    """Normalized, hashable parameter tuple of a scenario (timestamp and other extra keys ignored)"""
+    key = tuple(int(scenario[key]) if key == 'loan_period' else float(scenario[key]) for key in SCENARIO_KEYS)
+    terms = contract_terms(scenario)
+    if terms:
+        key += tuple((name, _freeze(value)) for name, value in sorted(terms.items()))
+    return key
+
+
+def contract_terms(scenario):
+    """The CONTRACT_KEYS set in a scenario, leaving out empty and default values"""
+    terms = {key: scenario[key] for key in CONTRACT_KEYS if scenario.get(key) not in (None, [], ())}
+    if terms.get('periods_per_year') == 12:
+        del terms['periods_per_year']
+    return terms
+
+
+def schedule_metrics(schedule):
+    """The BATCH_METRICS of a computed schedule, as evaluate_batch returns them for one scenario"""
+    return {
+        'loan_amount': schedule.loan_amount,
+        'misc_costs': schedule.misc_costs,
+        'upfront_costs': schedule.upfront_costs,
+        'monthly_repayment': schedule.monthly_repayment,
+        'yearly_repayment': schedule.yearly_repayment,
+        'total_interest': schedule.total_interest,
+        'extra_cost': schedule.extra_cost,
+        'effective_cost': schedule.effective_cost,
+        'payoff_month': int(np.ceil(schedule.months[schedule.payoff_idx] - 1e-9)),
+        'breakeven_month': int(np.ceil(schedule.months[schedule.breakeven_idx] - 1e-9)),
+    }
+
+
+def amortize_paths(scenario, mortgage_rate):
+    """Loan schedule of one scenario under many paths of monthly mortgage rates.
+
+    mortgage_rate is a (paths x months) array of yearly percentage rates covering the loan
+    period. The repayments are those agreed at purchase (the annuity at the scenario's
+    mortgage_rate plus the yearly special repayment); the balance follows the same exact
+    recurrence as compute_schedule with each path's rates. Returns a dictionary with the
+    scalar loan_amount and upfront_costs, the (paths x months) repayments, interest_repayment
+    and principle_repayment, and the payoff_idx of every path. Contract terms are not
+    supported and raise ValueError.
+    """
+    terms = contract_terms(scenario)
+    if terms:
+        raise ValueError(f"Contract terms are not supported for rate paths: {', '.join(terms)}")
+    params = _as_arrays(scenario)
+    costs = _upfront(params)
+    mortgage_rate = np.atleast_2d(np.asarray(mortgage_rate, dtype=float))
+    n_paths, width = mortgage_rate.shape
+    n_months = params['loan_period'] * 12
+    if width != n_months[0]:
+        raise ValueError(f"Got rates for {width} months, the loan period has {n_months[0]}")
+    repayments = np.repeat(_repayments(costs, n_months, width), n_paths, axis=0)
+    repayments, interest_repayment, principle_repayment, payoff_idx, _ = _balance_recurrence(
+        np.full(n_paths, costs['loan_amount'][0]), mortgage_rate / 12. / 100., repayments, np.repeat(n_months, n_paths))
+    return {
+        'loan_amount': float(costs['loan_amount'][0]),
+        'upfront_costs': float(costs['upfront_costs'][0]),
+        'repayments': repayments,
+        'interest_repayment': interest_repayment,
+        'principle_repayment': principle_repayment,
+        'payoff_idx': payoff_idx,
+    }
+
+
+def _freeze(value):
+    """Hashable copy of a JSON-like contract term"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return float(value)
+
+
+class ScheduleCache:
+    """Bounded LRU cache of computed schedules keyed on scenario_key.
+
+    Cached schedules are shared, so their arrays are made read-only. The cache is safe to
+    use from the GUI thread and the background recompute worker at the same time.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._schedules = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scenario):
+        """Return the schedule of a scenario, computing it on a miss"""
+        key = scenario_key(scenario)
+        with self._lock:
+            schedule = self._schedules.get(key)
+            if schedule is not None:
+                self._schedules.move_to_end(key)
+                self.hits += 1
+                return schedule
+            self.misses += 1
+
+        schedule = Schedule(scenario)
+        for value in vars(schedule).values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+
+        with self._lock:
+            self._schedules[key] = schedule
+            self._schedules.move_to_end(key)
+            while len(self._schedules) > self.maxsize:
+                self._schedules.popitem(last=False)
+        return schedule
+
+    def clear(self):
+        with self._lock:
+            self._schedules.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """Hit/miss counters and current size, in the spirit of functools.lru_cache.cache_info"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._schedules), 'maxsize': self.maxsize}
+
+    def __len__(self):
+        return len(self._schedules)
+
+
+def evaluate_batch(scenarios, chunk_size=512):
+    """Evaluate many scenarios at once and return their summary metrics.
+
+    scenarios maps each of SCENARIO_KEYS to a scalar or a 1-D array; all values are
+    broadcast to a common length. Scenarios are evaluated as (scenarios x months) arrays
+    padded to the longest loan_period, chunk_size rows at a time to bound memory.
+    Returns a dictionary mapping each of BATCH_METRICS to a 1-D array. payoff_month and
+    breakeven_month are 1-based month numbers as in Schedule.months.
+    """
+    params = _as_arrays(scenarios)
+    n_scenarios = len(params['raw_house_cost'])
+    results = {key: np.empty(n_scenarios) for key in BATCH_METRICS}
+    results['payoff_month'] = np.empty(n_scenarios, dtype=int)
+    results['breakeven_month'] = np.empty(n_scenarios, dtype=int)
+
+    # Group scenarios of similar length so that chunks carry little padding
+    order = np.argsort(params['loan_period'], kind='stable')
+    for start in range(0, n_scenarios, chunk_size):
+        rows = order[start:start + chunk_size]
+        chunk = {key: value[rows] for key, value in params.items()}
+        costs = _upfront(chunk)
+        n_months = chunk['loan_period'] * 12
+        width = int(n_months.max())
+        months = np.arange(1, width + 1, dtype=float)
+        valid = months <= n_months[:, None]
+
+        cumulative_interest, total_interest, payoff_idx = _cumulative_interest(chunk, costs, n_months, months)
+
+        # -profit - (cumulative_rent - other_costs), using profit = house_valuation - loan_amount
+        # - upfront_costs - cumulative_interest (the paid principal cancels out)
+        delta = cumulative_interest
+        delta += (costs['loan_amount'] + costs['upfront_costs'])[:, None]
+        delta -= chunk['raw_house_cost'][:, None] * _growth(chunk['house_inflation'], months)
+        delta -= ((chunk['monthly_rent'] - chunk['nebenkosten'])[:, None] * months) * _growth(chunk['inflation'], months)
+        np.abs(delta, out=delta)
+        delta[~valid] = np.inf
+
+        for key in ('loan_amount', 'misc_costs', 'upfront_costs', 'monthly_repayment', 'yearly_repayment'):
+            results[key][rows] = costs[key]
+        results['total_interest'][rows] = total_interest
+        results['extra_cost'][rows] = costs['misc_costs'] + total_interest
+        results['effective_cost'][rows] = costs['misc_costs'] + total_interest + chunk['raw_house_cost']
+        results['payoff_month'][rows] = payoff_idx + 1
+        results['breakeven_month'][rows] = np.argmin(delta, axis=1) + 1
+    return results
+
+
+def stack_scenarios(scenarios):
+    """Turn a list of scenario dictionaries into the array form accepted by evaluate_batch"""
+    return {key: np.array([scenario[key] for scenario in scenarios], dtype=float) for key in SCENARIO_KEYS}
+
+
+def scenario_grid(base, **axes):
+    """Cartesian product of parameter values around a base scenario.
+
+    Example: scenario_grid(base, mortgage_rate=np.linspace(1, 6, 50), down_payment=[0, 50000])
+    Returns the array form accepted by evaluate_batch, with the swept parameters varying
+    in C order (the last keyword varies fastest).
+    """
+    grids = np.meshgrid(*[np.asarray(values, dtype=float) for values in axes.values()], indexing='ij')
+    n_scenarios = grids[0].size if grids else 1
+    scenarios = {key: np.full(n_scenarios, float(base[key])) for key in SCENARIO_KEYS}
+    for key, grid in zip(axes, grids):
+        if key not in scenarios:
+            raise KeyError(f"Unknown scenario parameter '{key}'")
+        scenarios[key] = grid.ravel()
+    return scenarios
+
+
+def _as_arrays(scenarios):
+    """Broadcast the scenario inputs to 1-D float arrays (loan_period as int)"""
+    values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(scenarios[key], dtype=float)) for key in SCENARIO_KEYS])
+    params = {key: np.ravel(value) for key, value in zip(SCENARIO_KEYS, values)}
+    params['loan_period'] = params['loan_period'].astype(int)
+    return params
+
+
+def _upfront(params):
+    """Loan amount, buying costs and regular repayments for each scenario"""
+    raw_house_cost = params['raw_house_cost']
+    buy_cost_perc = (params['broker_commission'] + params['notary'] +
+                     params['land_registry'] + params['land_transfer_tax']) / 100.
+    misc_costs = raw_house_cost * buy_cost_perc
+    loan_amount = raw_house_cost - params['down_payment']
+    return {
+        'misc_costs': misc_costs,
+        'upfront_costs': misc_costs + params['down_payment'],
+        'loan_amount': loan_amount,
+        'yearly_repayment': raw_house_cost * params['yearly_repayment'] / 100.,
+        'monthly_repayment': np.atleast_1d(annuity_payment(loan_amount, params['mortgage_rate'], params['loan_period'])),
+    }
+
+
+def _repayments(costs, n_months, width):
+    """The annuity every month plus the special repayment every 12th month, zero past n_months"""
+    valid = np.arange(width) < n_months[:, None]
+    repayments = np.where(valid, costs['monthly_repayment'][:, None], 0.)
+    repayments[:, 11::12] += np.where(valid[:, 11::12], costs['yearly_repayment'][:, None], 0.)
+    return repayments
+
+
+def _balance_recurrence(loan_amount, rate, repayments, n_months, tol=1e-6):
+    """Outstanding balance b_t = b_{t-1} (1 + r_t) - P_t of every row, without a loop over months.
+
+    rate is the rate per period of each scenario (1-D) or of each scenario and period (2-D).
+    Dividing the recurrence by the growth factor g_t = prod_{s<=t} (1 + r_s) turns it into a
+    cumulative sum, b_t = g_t (b_0 - cumsum(P / g)_t). The payment in which the balance
+    reaches zero is reduced to the outstanding amount b_{t-1} (1 + r_t) and later payments
+    are dropped; interest is r_t b_{t-1}. Returns the clamped repayments, interest and
+    principal, the payoff index (n_months - 1 if the loan is not repaid in time) and the
+    balances, all of shape (scenarios, periods).
+    """
+    width = repayments.shape[1]
+    periods = np.arange(width)
+    log_growth = np.log1p(rate)
+    if log_growth.ndim == 1:
+        growth = np.exp(log_growth[:, None] * (periods + 1.))
+    else:
+        growth = np.exp(np.cumsum(log_growth, axis=1))
+    balances = growth * (loan_amount[:, None] - np.cumsum(repayments / growth, axis=1))
+
+    valid = periods < n_months[:, None]
+    paid_off = (balances <= tol) & valid
+    repaid = paid_off.any(axis=1)
+    payoff_idx = np.where(repaid, paid_off.argmax(axis=1), n_months - 1)
+
+    previous = np.concatenate((loan_amount[:, None], balances[:, :-1]), axis=1)
+    previous[(periods > payoff_idx[:, None]) | ~valid] = 0.
+    interest_repayment = previous * (rate if rate.ndim == 2 else rate[:, None])
+    repayments = np.where(periods > payoff_idx[:, None], 0., repayments)
+    final = repaid[:, None] & (periods == payoff_idx[:, None])
+    repayments[final] = (previous + interest_repayment)[final]
+    balances[repaid[:, None] & (periods >= payoff_idx[:, None])] = 0.
+    return repayments, interest_repayment, repayments - interest_repayment, payoff_idx, balances
+
+
+def _cumulative_interest(params, costs, n_months, months, tol=1e-6):
+    """Cumulative interest, total interest and payoff index of each row, for evaluate_batch.
+
+    Uses the balances of _balance_recurrence without materializing the clamped payments:
+    until the payoff month the interest paid so far is the gross repayments less the
+    principal repaid, loan_amount - b_t, and afterwards it stays at its total.
+    """
+    loan_amount = costs['loan_amount']
+    rate = params['mortgage_rate'] / 12. / 100.
+    growth = np.exp(np.log1p(rate)[:, None] * months)
+    balances = growth * (loan_amount[:, None] - np.cumsum(_repayments(costs, n_months, len(months)) / growth, axis=1))
+
+    periods = np.arange(len(months))
+    paid_off = (balances <= tol) & (periods < n_months[:, None])
+    payoff_idx = np.where(paid_off.any(axis=1), paid_off.argmax(axis=1), n_months - 1)
+
+    cumulative_interest = costs['monthly_repayment'][:, None] * months
+    cumulative_interest += costs['yearly_repayment'][:, None] * (months // 12)
+    cumulative_interest -= loan_amount[:, None]
+    cumulative_interest += balances
+
+    # Interest of the payoff month is r b_{k-1}, whether or not its payment is clamped
+    rows = np.arange(len(loan_amount))
+    before = np.maximum(payoff_idx - 1, 0)
+    previous_balance = np.where(payoff_idx > 0, balances[rows, before], loan_amount)
+    previous_interest = np.where(payoff_idx > 0, cumulative_interest[rows, before], 0.)
+    total_interest = np.where(loan_amount > tol, previous_interest + rate * previous_balance, 0.)
+    cumulative_interest = np.where(periods >= payoff_idx[:, None], total_interest[:, None], cumulative_interest)
+    return cumulative_interest, total_interest, payoff_idx
+
+
+def _growth(rate, months):
+    """Monthly compounded growth (1 + rate/12/100) ** months for yearly percentage rates"""
+    return np.exp(np.log1p(rate / 12. / 100.)[:, None] * months)
+
+
+def _amortize(params, costs, n_months, width):
+    """Repayment, interest and principal arrays of shape (scenarios, width)"""
+    repayments, interest_repayment, principle_repayment, payoff_idx, _ = _balance_recurrence(
+        costs['loan_amount'], params['mortgage_rate'] / 12. / 100., _repayments(costs, n_months, width), n_months)
+    return repayments, interest_repayment, principle_repayment, payoff_idx
+
+
+def _amortize_contract(params, costs, terms, periods_per_year, width, tol=1e-6):
+    """Repayment, interest and principal arrays of shape (1, width) of one scenario with contract terms.
+
+    The balance follows b_t = b_{t-1} (1 + r) - P_t with the rate r of each segment. Within a
+    segment starting from balance b_a this is evaluated at once as
+        b_t = g_t (b_a - cumsum(P / g)_t),   g_t = (1 + r) ** (t - a),
+    so the cost is a few array operations per segment, whatever the resolution. At every rate
+    reset and at the end of every payment holiday the regular payment is re-amortized over the
+    remaining term; the payment in which the balance reaches zero is reduced to the outstanding
+    amount. Also returns the initial regular payment per month.
+    """
+    loan_period = float(params['loan_period'][0])
+    periods = np.arange(width)
+
+    # Rate resets: the mortgage_rate until the first one
+    resets = {0: float(params['mortgage_rate'][0])}
+    for start_year, rate in sorted(terms.get('rate_segments', ())):
+        if not 0 < start_year < loan_period:
+            raise ValueError(f"Rate segment starting in year {start_year} is outside the loan period")
+        resets[int(round(start_year * periods_per_year))] = float(rate)
+
+    # Special repayments at the end of every contract year plus extra payments, capped per year
+    special = np.zeros(width)
+    special[periods_per_year - 1::periods_per_year] = costs['yearly_repayment'][0]
+    for year, amount in terms.get('extra_payments', ()):
+        if not 0 <= year <= loan_period:
+            raise ValueError(f"Extra payment in year {year} is outside the loan period")
+        special[max(int(np.ceil(year * periods_per_year)) - 1, 0)] += amount
+    if 'special_repayment_cap' in terms:
+        year_start = periods - periods % periods_per_year
+        cumulative = np.cumsum(special)
+        within_year = np.minimum(cumulative - np.concatenate(([0.], cumulative))[year_start],
+                                 float(terms['special_repayment_cap']))
+        special = within_year - np.where(periods == year_start, 0., np.concatenate(([0.], within_year[:-1])))
+
+    # Payment holidays; the loan is re-amortized when each one ends, so it must end before the term
+    holiday = np.zeros(width, dtype=bool)
+    recasts = set()
+    for start_year, end_year in terms.get('payment_holidays', ()):
+        first, last = int(round(start_year * periods_per_year)), int(round(end_year * periods_per_year))
+        if not 0 <= first < last < width:
+            raise ValueError(f"Payment holiday from year {start_year} to {end_year} must start within "
+                             f"and end before the end of the loan period")
+        holiday[first:last] = True
+        recasts.add(last)
+
+    # Segments start at every rate reset and holiday end, each with the rate in effect there
+    reset_at = sorted(resets)
+    starts = sorted(resets.keys() | recasts)
+    rates = [resets[reset_at[np.searchsorted(reset_at, start, side='right') - 1]] for start in starts]
+    ends = starts[1:] + [width]
+
+    repayments = np.zeros(width)
+    interest_repayment = np.zeros(width)
+    balance = float(costs['loan_amount'][0])
+    payoff_idx = width - 1
+    first_payment = 0.
+    for segment, (start, end, rate) in enumerate(zip(starts, ends, rates)):
+        if balance <= tol:
+            payoff_idx = max(start - 1, 0)
+            break
+        r = rate / 100. / periods_per_year
+        regular = annuity_payment(balance, rate, (width - start) / periods_per_year, periods_per_year)
+        if segment == 0:
+            first_payment = regular
+        payments = np.where(holiday[start:end], 0., regular) + special[start:end]
+        growth = (1 + r) ** np.arange(1, end - start + 1)
+        balances = growth * (balance - np.cumsum(payments / growth))
+
+        paid_off = balances <= tol
+        if paid_off.any():
+            k = int(paid_off.argmax())
+            payments[k] = (balance if k == 0 else balances[k - 1]) * (1 + r)
+            payments[k + 1:] = 0.
+            balances[k:] = 0.
+            payoff_idx = start + k
+        repayments[start:end] = payments
+        interest_repayment[start:end] = np.concatenate(([balance], balances[:-1])) * r
+        balance = balances[-1]
+        if paid_off.any():
+            break
+
+    principle_repayment = repayments - interest_repayment
+    monthly_repayment = np.array([first_payment * periods_per_year / 12.])
+    return (repayments[None, :], interest_repayment[None, :], principle_repayment[None, :],
+            np.array([payoff_idx]), monthly_repayment)
+
+
+def _rent_vs_buy(params, costs, interest_repayment, principle_repayment, months):
+    """Cumulative rent, house valuation and profit of owning, shape (scenarios, months)"""
+    inflation_factor = _growth(params['inflation'], months)
+    total_repayment = interest_repayment + principle_repayment
+    cumulative_rent = months * params['monthly_rent'][:, None] * inflation_factor
+    other_costs = months * params['nebenkosten'][:, None] * inflation_factor
+    house_valuation = params['raw_house_cost'][:, None] * _growth(params['house_inflation'], months)
+    owed_to_bank = costs['loan_amount'][:, None] - np.cumsum(principle_repayment, axis=1)
+    total_cumulative_costs = np.cumsum(total_repayment, axis=1) + costs['upfront_costs'][:, None]
+    return {
+        'cumulative_rent': cumulative_rent,
+        'other_costs': other_costs,
+        'house_valuation': house_valuation,
+        'owed_to_bank': owed_to_bank,
+        'total_cumulative_costs': total_cumulative_costs,
+        'profit': house_valuation - owed_to_bank - total_cumulative_costs,
+    }
+
+
+def _breakeven_idx(rent, n_months):
+    """Month index where the money lost by buying is closest to the rent saved"""
+    delta_min = ((-rent['profit']) - (rent['cumulative_rent'] - rent['other_costs'])) ** 2
+    delta_min[np.arange(delta_min.shape[1]) >= n_months[:, None]] = np.inf
+    return np.argmin(delta_min, axis=1)
@@ -0,0 +1,190 @@
+"""Export of full month-by-month schedules of large sweeps to memory-mapped .npy files"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from house_calc_batch import iter_scenarios
+from house_calc_engine import (SCENARIO_KEYS, _amortize, _as_arrays, _rent_vs_buy, _upfront, compute_schedule,
+                               contract_terms, stack_scenarios)
+from house_calc_store import DEFAULT_SCENARIO_FILE, write_json_atomic
+
+# Exported series, each stored as its own (scenarios x months) file
+SERIES = (
+    'principle_repayment',
+    'interest_repayment',
+    'owed_to_bank',
+    'house_valuation',
+    'cumulative_rent',
+    'profit',
+)
+
+INDEX_FILE = 'index.json'
+
+
+class ScheduleArchive:
+    """Read access to an exported directory of schedules.
+
+    Every series is a memory-mapped (scenarios x months) array, so archive.series('profit')[:, 120]
+    or archive.scenario('Scenario 7') only read the pages they touch. Months past a scenario's
+    loan period are NaN.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+        self.names = index['names']
+        self.series_names = tuple(index['series'])
+        self.n_months = np.array(index['n_months'], dtype=int)
+        self.months = np.arange(1, index['width'] + 1, dtype=float)
+        self._positions = None
+        self._series = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def series(self, key):
+        """(scenarios x months) array of one series, memory-mapped read-only"""
+        if key not in self.series_names:
+            raise KeyError(f"Unknown series '{key}', expected one of {', '.join(self.series_names)}")
+        if key not in self._series:
+            self._series[key] = np.load(os.path.join(self.directory, f'{key}.npy'), mmap_mode='r')
+        return self._series[key]
+
+    def inputs(self):
+        """(scenarios x 13) array of the scenario inputs, in the order of SCENARIO_KEYS"""
+        return np.load(os.path.join(self.directory, 'inputs.npy'), mmap_mode='r')
+
+    def index(self, name):
+        """Row of a scenario name"""
+        if self._positions is None:
+            self._positions = {name: i for i, name in enumerate(self.names)}
+        return self._positions[name]
+
+    def scenario(self, key):
+        """{series: array} of one scenario, by name or row, trimmed to its loan period"""
+        i = key if isinstance(key, (int, np.integer)) else self.index(key)
+        n = self.n_months[i]
+        return {name: np.array(self.series(name)[i, :n]) for name in self.series_names}
+
+
+def export_schedules(directory, scenarios, names=None, dtype='float32', chunk_size=512, overrides=None):
+    """Write the full schedules of many scenarios into directory, chunk_size rows at a time.
+
+    scenarios is the array form accepted by evaluate_batch. Each series is preallocated as a
+    memory-mapped .npy file and filled chunk by chunk, so memory use stays at one chunk
+    however many scenarios there are. overrides maps rows to Schedule objects replacing the
+    batch computation (scenarios with contract terms). Returns the number of scenarios.
+    """
+    params = _as_arrays(scenarios)
+    n_scenarios = len(params['raw_house_cost'])
+    n_months = params['loan_period'] * 12
+    width = int(n_months.max()) if n_scenarios else 0
+    overrides = overrides or {}
+    if names is None:
+        names = [f"Scenario {i}" for i in range(n_scenarios)]
+    if len(names) != n_scenarios:
+        raise ValueError(f"Got {len(names)} names for {n_scenarios} scenarios")
+
+    os.makedirs(directory, exist_ok=True)
+    outputs = {key: np.lib.format.open_memmap(os.path.join(directory, f'{key}.npy'), mode='w+', dtype=dtype,
+                                              shape=(n_scenarios, width))
+               for key in SERIES}
+    inputs = np.lib.format.open_memmap(os.path.join(directory, 'inputs.npy'), mode='w+', dtype=float,
+                                       shape=(n_scenarios, len(SCENARIO_KEYS)))
+
+    # Group scenarios of similar length so that chunks carry little padding, as in evaluate_batch
+    order = np.argsort(params['loan_period'], kind='stable')
+    for start in range(0, n_scenarios, chunk_size):
+        rows = np.sort(order[start:start + chunk_size])
+        chunk = {key: value[rows] for key, value in params.items()}
+        chunk_width = int(n_months[rows].max())
+        replaced = [(j, overrides[row]) for j, row in enumerate(rows) if row in overrides]
+        for key, block in _schedule_series(chunk, chunk_width).items():
+            for j, schedule in replaced:
+                block[j, :len(schedule.months)] = getattr(schedule, key)
+            outputs[key][rows, :chunk_width] = block
+            outputs[key][rows, chunk_width:] = np.nan
+        inputs[rows] = np.column_stack([chunk[key] for key in SCENARIO_KEYS])
+
+    for output in outputs.values():
+        output.flush()
+    inputs.flush()
+    write_json_atomic(os.path.join(directory, INDEX_FILE), {
+        'names': list(names),
+        'series': list(SERIES),
+        'dtype': np.dtype(dtype).name,
+        'width': width,
+        'n_months': n_months.tolist(),
+    })
+    return n_scenarios
+
+
+def export_scenarios(directory, named_scenarios, **kwargs):
+    """Export (name, scenario) pairs, such as those of iter_scenarios.
+
+    The scenario dictionaries are small and are collected first to size the files; scenarios
+    with contract terms are computed one by one and must be monthly.
+    """
+    names, bodies = [], []
+    for name, scenario in named_scenarios:
+        names.append(name)
+        bodies.append(scenario)
+    overrides = {}
+    for i, scenario in enumerate(bodies):
+        if contract_terms(scenario):
+            if int(contract_terms(scenario).get('periods_per_year', 12)) != 12:
+                raise ValueError(f"Scenario '{names[i]}' is not monthly; only monthly schedules can be exported")
+            overrides[i] = compute_schedule(scenario)
+    params = stack_scenarios(bodies) if bodies else {key: np.empty(0) for key in SCENARIO_KEYS}
+    return export_schedules(directory, params, names, overrides=overrides, **kwargs)
+
+
+def _schedule_series(params, width):
+    """The SERIES of a chunk of scenarios as (scenarios x width) arrays, NaN past each loan period"""
+    costs = _upfront(params)
+    n_months = params['loan_period'] * 12
+    months = np.arange(1, width + 1, dtype=float)
+    _, interest_repayment, principle_repayment, _ = _amortize(params, costs, n_months, width)
+    rent = _rent_vs_buy(params, costs, interest_repayment, principle_repayment, months)
+    series = {
+        'principle_repayment': principle_repayment,
+        'interest_repayment': interest_repayment,
+        'owed_to_bank': rent['owed_to_bank'],
+        'house_valuation': rent['house_valuation'],
+        'cumulative_rent': rent['cumulative_rent'],
+        'profit': rent['profit'],
+    }
+    invalid = months > n_months[:, None]
+    for block in series.values():
+        block[invalid] = np.nan
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export full schedules of saved scenarios to memory-mapped files")
+    parser.add_argument('inputs', nargs='*', default=[DEFAULT_SCENARIO_FILE],
+                        help="Scenario files (.json), stores (.db, .sqlite) or directories of .json files")
+    parser.add_argument('-o', '--output', required=True, help="Output directory")
+    parser.add_argument('--dtype', choices=('float32', 'float64'), default='float32')
+    parser.add_argument('--chunk-size', type=int, default=512, help="Scenarios computed at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        count = export_scenarios(args.output, iter_scenarios(args.inputs), dtype=args.dtype,
+                                 chunk_size=args.chunk_size)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(args.output, f'{key}.npy')) for key in SERIES)
+    print(f"Exported {count} schedules ({size / 2 ** 20:,.1f} MiB) to {args.output} in {elapsed:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
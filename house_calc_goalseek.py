@@ -0,0 +1,220 @@
+"""Goal seek over the batch engine: find the input value at which a metric reaches a target"""
+import argparse
+import operator
+
+import numpy as np
+
+from house_calc_engine import BATCH_METRICS, SCENARIO_KEYS, evaluate_batch
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+# Inputs that only take whole values; they are scanned value by value instead of refined
+INTEGER_PARAMETERS = ('loan_period',)
+
+# Metrics derived from the evaluate_batch results, next to BATCH_METRICS
+DERIVED_METRICS = {
+    'extra_cost_perc': lambda metrics, params: metrics['extra_cost'] * 100 / params['raw_house_cost'],
+    'monthly_total': lambda metrics, params: metrics['monthly_repayment'] + params['nebenkosten'],
+}
+
+CONSTRAINT_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def goal_seek(base, parameter, metric, target, lo, hi, tol=None, samples=64):
+    """Smallest value of parameter in [lo, hi] at which metric crosses target.
+
+    Example: goal_seek(scenario, 'down_payment', 'monthly_repayment', 1500, 0, 350000)
+    All other inputs are taken from base. metric is one of BATCH_METRICS, a key of
+    DERIVED_METRICS or a callable (metrics, params) -> array. Raises ValueError if metric
+    does not cross target anywhere in the range.
+    """
+    crossings = find_crossings(base, parameter, metric, target, lo, hi, tol, samples)
+    if not len(crossings):
+        values = _residual(_vary(_base_params(base), parameter, np.linspace(lo, hi, samples)), metric, 0.)
+        raise ValueError(f"{metric} stays between {values.min():,.2f} and {values.max():,.2f} "
+                         f"for {parameter} in [{lo}, {hi}], never reaching {target}")
+    return crossings[0]
+
+
+def find_crossings(base, parameter, metric, target, lo, hi, tol=None, samples=64):
+    """All values of parameter in [lo, hi] at which metric crosses target, in ascending order.
+
+    The range is scanned at samples points in one batch and every bracketed crossing is then
+    refined to within tol (default 1e-6 of the range). Crossings closer together than the scan
+    spacing may be missed. For integer parameters the first whole value past each crossing is
+    returned.
+    """
+    rows, values = _crossings(_base_params(base), parameter, metric, target, lo, hi, tol, samples)
+    return values
+
+
+def frontier(base, x_parameter, x_values, y_parameter, metric, target, lo, hi, tol=None, samples=64):
+    """For each x value, the smallest y value in [lo, hi] at which metric crosses target.
+
+    Example: frontier(scenario, 'mortgage_rate', np.linspace(1, 8, 200), 'down_payment',
+                      'monthly_repayment', 1500, 0, 350000)
+    All x values are solved together; entries where metric never crosses target are NaN.
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    params = _vary(_base_params(base), x_parameter, x_values)
+    rows, values = _crossings(params, y_parameter, metric, target, lo, hi, tol, samples)
+    result = np.full(len(x_values), np.nan)
+    # Crossings come ordered by row and then by value, so the first of each row is its smallest
+    first_rows, first = np.unique(rows, return_index=True)
+    result[first_rows] = values[first]
+    return result
+
+
+def feasible_region(base, x_parameter, x_values, y_parameter, y_values, constraints):
+    """Which combinations of two inputs satisfy all constraints.
+
+    constraints is a list of (metric, operator, target) triples, for example
+    [('monthly_total', '<=', 1800), ('breakeven_month', '<=', 120)].
+    Returns a boolean (len(x_values), len(y_values)) array and the metric grids it was
+    computed from, all from a single evaluate_batch call.
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    params = _base_params(base)
+    params[x_parameter] = np.repeat(x_values, len(y_values))
+    params[y_parameter] = np.tile(y_values, len(x_values))
+    metrics = evaluate_batch(params)
+
+    shape = (len(x_values), len(y_values))
+    feasible = np.ones(shape, dtype=bool)
+    grids = {}
+    for metric, op, target in constraints:
+        if op not in CONSTRAINT_OPERATORS:
+            raise ValueError(f"Unknown constraint operator '{op}', expected one of {', '.join(CONSTRAINT_OPERATORS)}")
+        grids[metric] = _metric(metrics, params, metric).reshape(shape)
+        feasible &= CONSTRAINT_OPERATORS[op](grids[metric], target)
+    return feasible, grids
+
+
+def _base_params(base):
+    """Single-row array form of a scenario dictionary"""
+    for key in SCENARIO_KEYS:
+        if key not in base:
+            raise KeyError(f"Scenario is missing '{key}'")
+    return {key: np.array([base[key]], dtype=float) for key in SCENARIO_KEYS}
+
+
+def _vary(params, parameter, values):
+    """Repeat every row of params once per value, with parameter set to the values"""
+    if parameter not in SCENARIO_KEYS:
+        raise KeyError(f"Unknown scenario parameter '{parameter}'")
+    values = np.asarray(values, dtype=float)
+    n_rows = len(params[parameter])
+    varied = {key: np.repeat(value, len(values)) for key, value in params.items()}
+    varied[parameter] = np.tile(values, n_rows)
+    return varied
+
+
+def _metric(metrics, params, metric):
+    if callable(metric):
+        return np.asarray(metric(metrics, params), dtype=float)
+    if metric in DERIVED_METRICS:
+        return DERIVED_METRICS[metric](metrics, params)
+    if metric not in BATCH_METRICS:
+        raise KeyError(f"Unknown metric '{metric}'")
+    return metrics[metric].astype(float)
+
+
+def _residual(params, metric, target):
+    return _metric(evaluate_batch(params), params, metric) - target
+
+
+def _crossings(params, parameter, metric, target, lo, hi, tol, samples):
+    """Crossings of metric through target along parameter, for every row of params.
+
+    Returns (rows, values): the row index and parameter value of each crossing, sorted by
+    row and then by value.
+    """
+    if tol is not None and not tol > 0:
+        raise ValueError(f"tol must be positive, got {tol}")
+    n_rows = len(params[parameter])
+    if parameter in INTEGER_PARAMETERS:
+        grid = np.arange(np.ceil(lo), np.floor(hi) + 1)
+    else:
+        grid = np.linspace(lo, hi, samples)
+    if len(grid) < 2:
+        return np.empty(0, dtype=int), np.empty(0)
+
+    # A crossing is wherever the residual changes between negative and non-negative
+    above = _residual(_vary(params, parameter, grid), metric, target).reshape(n_rows, len(grid)) >= 0
+    rows, k = np.nonzero(above[:, 1:] != above[:, :-1])
+    if parameter in INTEGER_PARAMETERS:
+        return rows, grid[k + 1]
+
+    if tol is None:
+        tol = 1e-6 * (hi - lo)
+    bracket_params = {key: value[rows] for key, value in params.items()}
+    return rows, _refine(bracket_params, parameter, metric, target, grid[k], grid[k + 1], above[rows, k], tol)
+
+
+def _refine(params, parameter, metric, target, lo, hi, lo_above, tol, points=15, max_rounds=60):
+    """Shrink every bracket [lo, hi] around its crossing until narrower than tol.
+
+    Each round evaluates points interior values of all brackets in one batch and keeps the
+    sub-interval where the residual changes side, narrowing the brackets (points + 1) times;
+    a batch of a few rows costs barely more than a single scenario. Stops after max_rounds,
+    or once no bracket narrows any more because tol is below the floating point resolution.
+    """
+    if not tol > 0:
+        raise ValueError(f"tol must be positive, got {tol}")
+    n_brackets = len(lo)
+    rows = np.arange(n_brackets)
+    fractions = np.arange(1, points + 1) / (points + 1)
+    for _ in range(max_rounds):
+        width = hi - lo
+        if not n_brackets or not np.any(width > tol):
+            break
+        xs = lo[:, None] + width[:, None] * fractions
+        varied = {key: np.repeat(value, points) for key, value in params.items()}
+        varied[parameter] = xs.ravel()
+        changed = (_residual(varied, metric, target).reshape(n_brackets, points) >= 0) != lo_above[:, None]
+
+        # The new bracket ends at the first interior point past the crossing, or at hi if none
+        j = np.where(changed.any(axis=1), changed.argmax(axis=1), points)
+        lo = np.where(j > 0, xs[rows, np.maximum(j - 1, 0)], lo)
+        hi = np.where(j < points, xs[rows, np.minimum(j, points - 1)], hi)
+        if np.array_equal(hi - lo, width):
+            break
+    return (lo + hi) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the input value at which a metric reaches a target")
+    parser.add_argument('scenario', help="Name of the saved scenario providing the other inputs")
+    parser.add_argument('parameter', choices=SCENARIO_KEYS, help="Input to solve for")
+    parser.add_argument('metric', help=f"Metric: {', '.join(BATCH_METRICS + tuple(DERIVED_METRICS))}")
+    parser.add_argument('target', type=float)
+    parser.add_argument('lo', type=float, help="Lower end of the search range")
+    parser.add_argument('hi', type=float, help="Upper end of the search range")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite)")
+    parser.add_argument('--all', action='store_true', help="Print every crossing instead of the first")
+    args = parser.parse_args()
+
+    with open_store(args.scenarios) as store:
+        if args.scenario not in store:
+            parser.error(f"no scenario named '{args.scenario}' in {args.scenarios}")
+        base = store[args.scenario]
+
+    if args.all:
+        for value in find_crossings(base, args.parameter, args.metric, args.target, args.lo, args.hi):
+            print(f"{args.parameter} = {value:,.4f}")
+        return
+    try:
+        value = goal_seek(base, args.parameter, args.metric, args.target, args.lo, args.hi)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    print(f"{args.parameter} = {value:,.4f}")
+
+
+if __name__ == "__main__":
+    main()
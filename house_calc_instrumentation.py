@@ -0,0 +1,135 @@
+"""Optional per-stage timing of the GUI hot paths, recorded into a ring buffer"""
+import cProfile
+import io
+import json
+import pstats
+import time
+from collections import deque
+
+
+class _NullMeasurement:
+    """Stand-in returned while instrumentation is disabled; every method is a no-op"""
+
+    def stage(self, name):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_MEASUREMENT = _NullMeasurement()
+
+
+class Measurement:
+    """Wall time of one operation, split into consecutive named stages"""
+
+    def __init__(self, instrumentation, operation, profiler=None):
+        self.instrumentation = instrumentation
+        self.operation = operation
+        self.stages = {}
+        self.profiler = profiler
+
+    def stage(self, name):
+        """Close the current stage under name; the next stage starts now"""
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.) + (now - self._last) * 1000.
+        self._last = now
+
+    def __enter__(self):
+        self.wall_time = time.time()
+        self._start = self._last = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        end = time.perf_counter()
+        if end - self._last > 1e-6 and self.stages:
+            self.stages['other'] = self.stages.get('other', 0.) + (end - self._last) * 1000.
+        self.instrumentation._record(self, (end - self._start) * 1000.)
+        return False
+
+
+class Instrumentation:
+    """Records per-stage wall times of instrumented operations when enabled.
+
+    Usage:
+        with instrumentation.measure('update_plots') as timing:
+            ...
+            timing.stage('math')
+            ...
+            timing.stage('draw')
+
+    While disabled, measure() returns a shared no-op object, so instrumented code pays only
+    for one attribute check.
+    """
+
+    def __init__(self, enabled=False, maxlen=1000):
+        self.enabled = enabled
+        self.records = deque(maxlen=maxlen)
+        self.listeners = []
+        self._profile_operation = None
+        self._profile_path = None
+        self.last_profile = None
+
+    def measure(self, operation):
+        if not self.enabled:
+            return NULL_MEASUREMENT
+        profiler = None
+        if self._profile_operation in (operation, '*'):
+            profiler = cProfile.Profile()
+        return Measurement(self, operation, profiler)
+
+    def profile_next(self, operation='*', path=None):
+        """Run the next measured operation (any operation for '*') under cProfile.
+
+        The statistics are kept as text in last_profile and, if path is given, saved with
+        pstats for snakeviz and friends.
+        """
+        self._profile_operation = operation
+        self._profile_path = path
+
+    def dump(self, path):
+        """Write the recorded timings as JSON lines"""
+        with open(path, 'w') as f:
+            for record in self.records:
+                f.write(json.dumps(record) + '\n')
+
+    def summary(self, operation):
+        """Mean and maximum total time of the recorded runs of an operation"""
+        totals = [record['total_ms'] for record in self.records if record['operation'] == operation]
+        if not totals:
+            return None
+        return {'count': len(totals), 'mean_ms': sum(totals) / len(totals), 'max_ms': max(totals)}
+
+    def _record(self, measurement, total_ms):
+        record = {
+            'operation': measurement.operation,
+            'time': measurement.wall_time,
+            'total_ms': total_ms,
+            'stages': measurement.stages,
+        }
+        self.records.append(record)
+        if measurement.profiler is not None:
+            self._finish_profile(measurement.profiler)
+        for listener in self.listeners:
+            listener(record)
+
+    def _finish_profile(self, profiler):
+        self._profile_operation = None
+        if self._profile_path:
+            profiler.dump_stats(self._profile_path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(25)
+        self.last_profile = text.getvalue()
+
+
+def format_record(record):
+    """One-line description of a record, e.g. for a status bar"""
+    stages = ' | '.join(f"{name} {ms:.1f}" for name, ms in record['stages'].items())
+    return f"{record['operation']}: {record['total_ms']:.1f} ms" + (f" ({stages})" if stages else "")
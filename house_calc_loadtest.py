@@ -0,0 +1,129 @@
+"""Load test of the local calculation service: requests/second and latency percentiles"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from house_calc_benchmarks import DEFAULT_SCENARIO
+
+# Request mixes: 'repeat' always sends the same scenario (cache hits), 'random' varies the
+# inputs on every request (cache misses), 'batch' sends batches of random scenarios
+MODES = ('repeat', 'random', 'batch')
+
+
+def make_request(host, path, payload):
+    body = json.dumps(payload).encode()
+    head = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+def random_scenario(rng):
+    return dict(DEFAULT_SCENARIO, raw_house_cost=float(rng.uniform(100000, 1000000)),
+                mortgage_rate=float(rng.uniform(1, 10)), loan_period=int(rng.integers(10, 51)))
+
+
+async def read_response(reader):
+    """Status code of the next response, after reading its body"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def client(host, port, mode, batch_size, deadline, seed, latencies, errors):
+    """Send requests back to back over one keep-alive connection until deadline"""
+    rng = np.random.default_rng(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    repeat = make_request(host, '/schedule', DEFAULT_SCENARIO)
+    try:
+        while time.perf_counter() < deadline:
+            if mode == 'repeat':
+                request = repeat
+            elif mode == 'random':
+                request = make_request(host, '/schedule', random_scenario(rng))
+            else:
+                request = make_request(host, '/batch', {'scenarios': [random_scenario(rng) for _ in range(batch_size)]})
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, mode='repeat', concurrency=8, duration=5., batch_size=100):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[client(host, port, mode, batch_size, deadline, seed, latencies, errors)
+                           for seed in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000.
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+        'max_ms': float(latencies.max()) if len(latencies) else None,
+    }
+
+
+def start_server(extra_args=()):
+    """Start house_calc_server.py on a free port; returns the process and the port"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'house_calc_server.py')
+    process = subprocess.Popen([sys.executable, script, '--port', '0', *extra_args], stderr=subprocess.PIPE, text=True)
+    line = process.stderr.readline()
+    if not line.startswith('Serving on'):
+        process.kill()
+        raise RuntimeError(f"Server did not start: {line.strip()}")
+    return process, int(line.rsplit(':', 1)[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure requests/s and latency of the local calculation service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="Port of a running server (default: start one)")
+    parser.add_argument('--mode', choices=MODES, nargs='+', default=list(MODES))
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Concurrent keep-alive connections")
+    parser.add_argument('-d', '--duration', type=float, default=5., help="Seconds per mode")
+    parser.add_argument('--batch-size', type=int, default=100, help="Scenarios per request in batch mode")
+    args = parser.parse_args()
+
+    process = None
+    port = args.port
+    if port is None:
+        process, port = start_server()
+    try:
+        for mode in args.mode:
+            result = asyncio.run(load_test(args.host, port, mode, args.concurrency, args.duration, args.batch_size))
+            print(f"{mode:<8} {result['requests']:7d} requests  {result['requests_per_s']:9.1f} req/s  "
+                  f"p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  errors {result['errors']}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Monte Carlo simulation of the rent-vs-buy comparison under stochastic rates and inflation"""
+import argparse
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from house_calc_engine import amortize_paths, contract_terms
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Default model parameters; volatilities are yearly standard deviations in percentage points
+DEFAULT_MODEL = {
+    'inflation_volatility': 0.5,
+    'house_inflation_volatility': 1.0,
+    'rate_volatility': 0.6,
+    'fixed_rate_years': 10,
+}
+
+
+def simulate(scenario, n_paths=10000, seed=0, chunk_size=1000, processes=None, percentiles=PERCENTILES, **model):
+    """Simulate n_paths stochastic paths of a scenario and summarize them.
+
+    inflation and house_inflation follow independent monthly random walks starting at the
+    scenario values; mortgage_rate is fixed for fixed_rate_years and then reset once to the
+    value of its own random walk at that time. Work is split into seeded chunks of chunk_size
+    paths, so results are reproducible for a given seed regardless of the number of processes.
+    """
+    return simulate_many({'scenario': scenario}, n_paths, seed, chunk_size, processes, percentiles, **model)['scenario']
+
+
+def simulate_many(scenarios, n_paths=10000, seed=0, chunk_size=1000, processes=None, percentiles=PERCENTILES, **model):
+    """Run simulate for every scenario of a {name: scenario} mapping on a shared process pool.
+
+    Chunks are submitted in scenario order with at most two per worker outstanding, and a
+    scenario's (paths x months) profit chunks are reduced to its summary as soon as the last
+    of them finishes, so memory holds the paths of only a few scenarios at a time however
+    many are simulated. Scenarios with contract terms are not supported and raise ValueError.
+    """
+    if n_paths < 1 or chunk_size < 1:
+        raise ValueError(f"n_paths and chunk_size must be at least 1, got {n_paths} and {chunk_size}")
+    for name, scenario in scenarios.items():
+        terms = contract_terms(scenario)
+        if terms:
+            raise ValueError(f"Scenario '{name}' has contract terms ({', '.join(terms)}), "
+                             f"which the simulation does not support")
+    model = {**DEFAULT_MODEL, **model}
+    n_chunks = -(-n_paths // chunk_size)
+    names = list(scenarios)
+    pending_chunks = {}
+    results = {}
+
+    def collect(name, i, chunk):
+        chunks = pending_chunks.setdefault(name, [None] * n_chunks)
+        chunks[i] = chunk
+        if all(chunk is not None for chunk in chunks):
+            results[name] = _summarize(pending_chunks.pop(name), percentiles)
+
+    if processes == 1 or len(names) * n_chunks == 1:
+        for name, i, args in _jobs(scenarios, n_paths, seed, chunk_size, model):
+            collect(name, i, _simulate_chunk(*args))
+    else:
+        max_pending = 2 * (processes or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {}
+            for name, i, args in _jobs(scenarios, n_paths, seed, chunk_size, model):
+                if len(futures) >= max_pending:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(*futures.pop(future), future.result())
+                futures[executor.submit(_simulate_chunk, *args)] = (name, i)
+            for future in wait(futures).done:
+                collect(*futures[future], future.result())
+    return {name: results[name] for name in names}
+
+
+def _jobs(scenarios, n_paths, seed, chunk_size, model):
+    """(name, chunk index, _simulate_chunk arguments) of every chunk, scenario by scenario"""
+    for name, scenario in scenarios.items():
+        # Seed each scenario from its name so results do not depend on the other scenarios
+        seed_sequence = np.random.SeedSequence([seed, zlib.crc32(name.encode())])
+        for i, child in enumerate(seed_sequence.spawn(-(-n_paths // chunk_size))):
+            size = min(chunk_size, n_paths - i * chunk_size)
+            yield name, i, (scenario, size, child, model)
+
+
+def _simulate_chunk(scenario, n_paths, seed_sequence, model):
+    """Profit paths and break-even months of one seeded chunk, shape (n_paths, months)"""
+    rng = np.random.default_rng(seed_sequence)
+    n_months = int(scenario['loan_period']) * 12
+    months = np.arange(1, n_months + 1, dtype=float)
+
+    inflation = _random_walk(rng, float(scenario['inflation']), model['inflation_volatility'], n_paths, n_months)
+    house_inflation = _random_walk(rng, float(scenario['house_inflation']), model['house_inflation_volatility'],
+                                   n_paths, n_months)
+    mortgage_rate = np.full((n_paths, n_months), float(scenario['mortgage_rate']))
+    reset = int(model['fixed_rate_years'] * 12)
+    if reset < n_months:
+        rate_walk = _random_walk(rng, float(scenario['mortgage_rate']), model['rate_volatility'], n_paths, reset + 1)
+        mortgage_rate[:, reset:] = rate_walk[:, -1:]
+
+    # Same balance recurrence as the engine, with the repayments agreed at purchase
+    loan = amortize_paths(scenario, mortgage_rate)
+    cumulative_interest = np.cumsum(loan['interest_repayment'], axis=1)
+
+    rent_growth = np.exp(np.cumsum(np.log1p(inflation / 12. / 100.), axis=1))
+    house_valuation = float(scenario['raw_house_cost']) * np.exp(np.cumsum(np.log1p(house_inflation / 12. / 100.),
+                                                                           axis=1))
+    profit = house_valuation - loan['loan_amount'] - loan['upfront_costs'] - cumulative_interest
+    rent_minus_costs = (float(scenario['monthly_rent']) - float(scenario['nebenkosten'])) * months * rent_growth
+    breakeven_month = np.argmin(np.abs(-profit - rent_minus_costs), axis=1) + 1
+    return profit, breakeven_month, cumulative_interest[:, -1]
+
+
+def _random_walk(rng, start, yearly_volatility, n_paths, n_months):
+    """Yearly percentage rate following a monthly random walk, floored at zero"""
+    shocks = rng.normal(0., yearly_volatility / np.sqrt(12.), size=(n_paths, n_months))
+    shocks[:, 0] = 0.
+    return np.maximum(start + np.cumsum(shocks, axis=1), 0.)
+
+
+def _summarize(chunks, percentiles):
+    """Percentile bands of the profit paths and of the break-even month"""
+    profit = np.concatenate([chunk[0] for chunk in chunks])
+    breakeven_month = np.concatenate([chunk[1] for chunk in chunks])
+    total_interest = np.concatenate([chunk[2] for chunk in chunks])
+    return {
+        'n_paths': len(profit),
+        'percentiles': list(percentiles),
+        'months': np.arange(1, profit.shape[1] + 1),
+        'profit_bands': np.percentile(profit, percentiles, axis=0),
+        'profit_mean': profit.mean(axis=0),
+        'breakeven_month': np.percentile(breakeven_month, percentiles),
+        'total_interest': np.percentile(total_interest, percentiles),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo rent-vs-buy simulation of saved scenarios")
+    parser.add_argument('scenario_file', nargs='?', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite)")
+    parser.add_argument('--paths', type=int, default=10000, help="Number of paths per scenario")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Paths per worker task")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="Worker processes")
+    for key, value in DEFAULT_MODEL.items():
+        parser.add_argument('--' + key.replace('_', '-'), type=float, default=value)
+    args = parser.parse_args()
+    if args.paths < 1:
+        parser.error("--paths must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    with open_store(args.scenario_file) as store:
+        scenarios = {}
+        for name, scenario in store.items():
+            if contract_terms(scenario):
+                print(f"Skipping {name}: contract terms ({', '.join(contract_terms(scenario))}) are not supported",
+                      file=sys.stderr)
+            else:
+                scenarios[name] = scenario
+    model = {key: getattr(args, key) for key in DEFAULT_MODEL}
+
+    start = time.perf_counter()
+    results = simulate_many(scenarios, args.paths, args.seed, args.chunk_size, args.processes, **model)
+    elapsed = time.perf_counter() - start
+
+    header = ' / '.join(f"p{p}" for p in PERCENTILES)
+    for name, result in results.items():
+        breakeven_years = ' / '.join(f"{month / 12:.1f}" for month in result['breakeven_month'])
+        final_profit = ' / '.join(f"{profit:,.0f}" for profit in result['profit_bands'][:, -1])
+        print(f"{name}:")
+        print(f"  Break-even year ({header}): {breakeven_years}")
+        print(f"  Profit at end of loan ({header}): {final_profit}")
+    print(f"{len(results) * args.paths} paths in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Search for the best special-repayment schedule and refinancing month of a scenario"""
+import argparse
+import time
+
+import numpy as np
+
+from house_calc_engine import _as_arrays, _growth, _upfront, annuity_payment, compute_schedule, contract_terms
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+OBJECTIVES = ('total_interest', 'profit')
+
+
+def optimize_strategy(scenario, cap=None, levels=5, refinance_rate=None, refinance_months=None, refinance_fee=0.,
+                      objective='total_interest', horizon_years=None, invest_rate=0., max_rounds=20):
+    """Best special repayment per contract year, and optionally the best month to refinance.
+
+    Each year's special repayment is one of levels amounts between 0 and cap (default: the
+    scenario's yearly_repayment). With refinance_rate, refinancing at each of
+    refinance_months (default: every contract year) is tried as well, with the payment
+    re-amortized over the remaining term as for rate_segments and refinance_fee paid in cash.
+
+    The household is assumed to spend the first regular payment every month and cap at the end
+    of every year either way; what does not go to the bank earns invest_rate (yearly %).
+    objective 'total_interest' minimizes interest plus fee over the loan, 'profit' maximizes
+    the profit curve at horizon_years including those savings. With invest_rate 0 both favour
+    repaying early; a higher invest_rate makes keeping cash worthwhile.
+
+    All strategies of a round are evaluated together by _evaluate (see there); each round
+    moves every year to its best level as long as that improves the objective.
+    Returns (strategy, schedule): a dictionary describing the best strategy, including the
+    scenario with the matching contract terms, and its computed schedule.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {', '.join(OBJECTIVES)}")
+    if contract_terms(scenario):
+        raise ValueError("The optimizer works on scenarios without contract terms")
+    model = _model(scenario, cap, refinance_rate, refinance_fee, objective, horizon_years, invest_rate)
+    n_months = model['n_months']
+    n_years = n_months // 12
+    amounts = np.linspace(0., model['cap'], levels)
+
+    # One strategy per refinancing option; n_months stands for no refinancing
+    if refinance_rate is None:
+        refinance = np.array([n_months])
+    else:
+        months = np.arange(12, n_months, 12) if refinance_months is None else np.asarray(refinance_months, dtype=int)
+        if np.any((months < 1) | (months >= n_months)):
+            raise ValueError(f"Refinancing months must be between 1 and {n_months - 1}")
+        refinance = np.concatenate(([n_months], months))
+    n_options = len(refinance)
+    specials = np.zeros((n_options, n_years))
+    scores = _evaluate(model, specials, refinance)
+
+    rounds = 0
+    evaluated = n_options
+    for rounds in range(1, max_rounds + 1):
+        # Every single-year change, for every refinancing option at once
+        trial = np.repeat(specials[:, None, None, :], n_years, axis=1).repeat(levels, axis=2)
+        years = np.arange(n_years)
+        trial[:, years, :, years] = amounts
+        trial_scores = _evaluate(model, trial.reshape(-1, n_years), np.repeat(refinance, n_years * levels))
+        gains = trial_scores.reshape(n_options, n_years, levels) - scores[:, None, None]
+        evaluated += trial_scores.size
+        if gains.max() <= 1e-9 * max(1., np.abs(scores).max()):
+            break
+
+        # Move every year to its best level together, or make the single best move if that is worse
+        together = np.where(gains.max(axis=2) > 0, amounts[gains.argmax(axis=2)], specials)
+        together_scores = _evaluate(model, together, refinance)
+        evaluated += n_options
+        best_single = gains.reshape(n_options, -1).argmax(axis=1)
+        single = specials.copy()
+        single[np.arange(n_options), best_single // levels] = amounts[best_single % levels]
+        single_scores = scores + gains.reshape(n_options, -1).max(axis=1)
+        use_together = together_scores >= single_scores
+        specials = np.where(use_together[:, None], together, single)
+        scores = np.where(use_together, together_scores, single_scores)
+
+    best = int(np.argmax(scores))
+    strategy = _strategy(scenario, model, specials[best], int(refinance[best]), scores[best])
+    strategy.update(rounds=rounds, strategies_evaluated=evaluated)
+    schedule = compute_schedule(strategy['scenario'])
+    strategy['total_interest'] = schedule.total_interest
+    strategy['payoff_month'] = schedule.payoff_idx + 1
+    return strategy, schedule
+
+
+def _model(scenario, cap, refinance_rate, refinance_fee, objective, horizon_years, invest_rate):
+    """Everything _evaluate needs that does not depend on the strategy"""
+    params = _as_arrays(scenario)
+    costs = _upfront(params)
+    n_months = int(params['loan_period'][0]) * 12
+    horizon = n_months if horizon_years is None else int(round(horizon_years * 12))
+    if not 1 <= horizon <= n_months:
+        raise ValueError(f"The horizon must be within the loan period of {n_months // 12} years")
+    cap = float(costs['yearly_repayment'][0]) if cap is None else float(cap)
+    months = np.arange(1, n_months + 1, dtype=float)
+
+    # Fixed household budget: the first regular payment every month and cap at every year end
+    regular = float(costs['monthly_repayment'][0])
+    budget = np.full(n_months, regular)
+    budget[11::12] += cap
+    invest = (1 + invest_rate / 12. / 100.) ** (horizon - months)
+    house_valuation = float(params['raw_house_cost'][0] * _growth(params['house_inflation'], months)[0, horizon - 1])
+    return {
+        'loan_amount': float(costs['loan_amount'][0]),
+        'rate': float(params['mortgage_rate'][0]),
+        'refinance_rate': float(params['mortgage_rate'][0] if refinance_rate is None else refinance_rate),
+        'refinance_fee': float(refinance_fee),
+        'regular': regular,
+        'cap': cap,
+        'n_months': n_months,
+        'horizon': horizon,
+        'objective': objective,
+        'budget': budget,
+        'invest': invest,
+        # Profit at the horizon without the loan: valuation less upfront costs and the budget spent
+        'profit_base': house_valuation - float(costs['upfront_costs'][0]) - budget[:horizon].sum(),
+    }
+
+
+def _evaluate(model, specials, refinance, tol=1e-6):
+    """Objective of many strategies, higher is better: the negated cost for 'total_interest'.
+
+    specials holds the special repayment per contract year of each strategy and refinance the
+    index of its first month at the new rate (n_months for none). Both rate segments use the
+    closed form of the balance recurrence, b_t = g_t (b_a - cumsum(P / g)_t), on (strategies
+    x months) arrays; before the refinancing month the second segment is masked out.
+    """
+    n_months = model['n_months']
+    loan_amount = model['loan_amount']
+    t = np.arange(1, n_months + 1)
+    special = np.zeros((len(specials), n_months))
+    special[:, 11::12] = specials
+
+    r1 = model['rate'] / 12. / 100.
+    g1 = (1 + r1) ** t
+    first = g1 * (loan_amount - np.cumsum((model['regular'] + special) / g1, axis=1))
+
+    # Balance at refinancing, re-amortized over the remaining term at the new rate
+    rows = np.arange(len(specials))
+    refinanced = refinance < n_months
+    start_balance = np.where(refinance > 0, first[rows, np.maximum(refinance - 1, 0)], loan_amount)
+    start_balance = np.maximum(start_balance, 0.)
+    remaining = np.maximum(n_months - refinance, 1) / 12.
+    r2 = model['refinance_rate'] / 12. / 100.
+    payment = np.atleast_1d(annuity_payment(start_balance, model['refinance_rate'], remaining))
+    g2 = (1 + r2) ** t
+    cumulative = np.cumsum((payment[:, None] + special) / g2, axis=1)
+    before = np.maximum(refinance - 1, 0)
+    g2_start = np.where(refinance > 0, g2[before], 1.)
+    cumulative_start = np.where(refinance > 0, cumulative[rows, before], 0.)
+    second = g2 * ((start_balance / g2_start)[:, None] - (cumulative - cumulative_start[:, None]))
+
+    in_second = t[None, :] > refinance[:, None]
+    balances = np.where(in_second, second, first)
+    rate = np.where(in_second, r2, r1)
+
+    # Clamp at payoff: nothing is owed or paid after the balance reaches zero
+    paid_off = balances <= tol
+    payoff_idx = np.where(paid_off.any(axis=1), paid_off.argmax(axis=1), n_months)
+    balances[np.arange(n_months) >= payoff_idx[:, None]] = 0.
+    previous = np.concatenate((np.full((len(specials), 1), loan_amount), balances[:, :-1]), axis=1)
+    interest = previous * rate
+    fee = np.where(refinanced, model['refinance_fee'], 0.)
+
+    if model['objective'] == 'total_interest':
+        return -(interest.sum(axis=1) + fee)
+
+    horizon = model['horizon']
+    paid = previous[:, :horizon] + interest[:, :horizon] - balances[:, :horizon]
+    saved = ((model['budget'][:horizon] - paid) * model['invest'][:horizon]).sum(axis=1)
+    fee_index = np.minimum(refinance, horizon) - 1
+    saved -= np.where(refinanced & (refinance < horizon), fee * model['invest'][fee_index], 0.)
+    return model['profit_base'] + saved - balances[:, horizon - 1]
+
+
+def _strategy(scenario, model, specials, refinance, score):
+    extra_payments = [[year + 1, round(float(amount), 2)] for year, amount in enumerate(specials) if amount > 0]
+    strategy_scenario = dict(scenario, yearly_repayment=0.)
+    if extra_payments:
+        strategy_scenario['extra_payments'] = extra_payments
+    strategy = {
+        'objective': model['objective'],
+        'value': -score if model['objective'] == 'total_interest' else score,
+        'extra_payments': extra_payments,
+        'refinance': None,
+    }
+    if refinance < model['n_months']:
+        strategy_scenario['rate_segments'] = [[refinance / 12., model['refinance_rate']]]
+        strategy['refinance'] = {'month': refinance, 'rate': model['refinance_rate'], 'fee': model['refinance_fee']}
+    strategy['scenario'] = strategy_scenario
+    return strategy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the best special repayments and refinancing month of a scenario")
+    parser.add_argument('scenario', help="Name of the saved scenario")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite)")
+    parser.add_argument('--cap', type=float, help="Maximum special repayment per year (default: the scenario's)")
+    parser.add_argument('--levels', type=int, default=5, help="Amounts tried per year, from 0 to the cap")
+    parser.add_argument('--refinance-rate', type=float, help="Rate available when refinancing (%%)")
+    parser.add_argument('--refinance-fee', type=float, default=0.)
+    parser.add_argument('--objective', choices=OBJECTIVES, default='total_interest')
+    parser.add_argument('--horizon', type=float, help="Horizon in years for the profit objective")
+    parser.add_argument('--invest-rate', type=float, default=0., help="Yearly return on money not repaid (%%)")
+    args = parser.parse_args()
+
+    with open_store(args.scenarios) as store:
+        if args.scenario not in store:
+            parser.error(f"no scenario named '{args.scenario}' in {args.scenarios}")
+        scenario = store[args.scenario]
+
+    start = time.perf_counter()
+    try:
+        strategy, schedule = optimize_strategy(scenario, args.cap, args.levels, args.refinance_rate,
+                                               refinance_fee=args.refinance_fee, objective=args.objective,
+                                               horizon_years=args.horizon, invest_rate=args.invest_rate)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    elapsed = time.perf_counter() - start
+
+    print(f"{strategy['objective']}: {strategy['value']:,.2f} ({strategy['strategies_evaluated']:,} strategies "
+          f"in {strategy['rounds']} rounds, {elapsed * 1000:.0f} ms)")
+    print(f"Total interest {strategy['total_interest']:,.2f}, paid off in month {strategy['payoff_month']}")
+    if strategy['refinance']:
+        refinance = strategy['refinance']
+        print(f"Refinance in month {refinance['month']} at {refinance['rate']}%")
+    for year, amount in strategy['extra_payments']:
+        print(f"Year {year:2d}: special repayment {amount:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""Schedule and sensitivity figures with persistent artists, usable with any matplotlib canvas"""
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+
+from house_calc_instrumentation import NULL_MEASUREMENT
+
+# Width in screen pixels of one decimation bucket; lines with more points than four per
+# bucket in view are reduced to the first, lowest, highest and last point of each bucket
+PIXELS_PER_BUCKET = 2
+
+
+def decimate(x, y, x_range, n_buckets, max_bucket=None):
+    """The points of a line within x_range, reduced to at most four per bucket.
+
+    x must be increasing and evenly spaced (as months are), so buckets of equal point counts
+    are also of equal width. Each bucket keeps its first, lowest, highest and last point, so
+    with a bucket per pixel column or finer the line looks the same as with every point
+    (M4 aggregation): spikes such as the yearly special repayments are not smoothed away.
+    max_bucket caps the points per bucket, e.g. at one year. The nearest point outside
+    x_range is kept on both sides so that the line runs to the edges of the axes.
+    """
+    start = max(int(np.searchsorted(x, x_range[0])) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_range[1], side='right')) + 1, len(x))
+    x = x[start:stop]
+    y = y[start:stop]
+    n = len(x)
+    if n == 0:
+        return x, y
+    size = -(-n // max(int(n_buckets), 1))
+    if max_bucket is not None:
+        size = min(size, max_bucket)
+    if n <= 4 * -(-n // size):
+        return x, y
+
+    n_blocks = -(-n // size)
+    blocks = np.concatenate((y, np.full(n_blocks * size - n, y[-1]))).reshape(n_blocks, size)
+    first = np.arange(n_blocks) * size
+    idx = np.column_stack((first, first + blocks.argmin(axis=1), first + blocks.argmax(axis=1),
+                           np.minimum(first + size - 1, n - 1)))
+    idx = np.minimum(np.sort(idx, axis=1), n - 1).ravel()
+    # Monotonic stretches have their extremes at the ends of the bucket; keep those points once
+    idx = idx[np.concatenate(([True], idx[1:] != idx[:-1]))]
+    return x[idx], y[idx]
+
+
+class LineDecimator:
+    """Full data of lines whose drawn data is decimated to the current view of their axes.
+
+    set_data keeps the full series; resample() gives each line the points of decimate for
+    the x limits and pixel width of its axes. Lines are only resampled when their data, the
+    x limits or the axes width changed, so zooming and panning resample and plain redraws
+    do not.
+    """
+
+    def __init__(self):
+        self.lines = {}
+        self._views = {}
+
+    def set_data(self, line, x, y):
+        self.lines[line] = (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        self._views.pop(line, None)
+
+    def resample(self):
+        views = {}
+        for line, (x, y) in self.lines.items():
+            ax = line.axes
+            if ax not in views:
+                views[ax] = (tuple(ax.get_xlim()), int(ax.get_window_extent().width))
+            view = views[ax]
+            if self._views.get(line) == view:
+                continue
+            self._views[line] = view
+            line.set_data(*decimate(x, y, view[0], view[1] // PIXELS_PER_BUCKET))
+
+
+class SchedulePlot:
+    """House buying costs (top) and rent-vs-buy analysis (bottom) of a Schedule.
+
+    The lines are created once; update() only replaces their data. Full redraws happen when
+    the axis limits, scale or ticks change, tight_layout only on resize, and interactive
+    updates with unchanged layout are blitted onto a cached background. The lines are drawn
+    decimated to the axes width (LineDecimator) and resampled when the toolbar zooms or pans,
+    so the drawing cost does not grow with the loan period or the periods per year.
+    """
+
+    # Fraction of the current axis span by which the target limits may differ before an
+    # interactive update gives up blitting and rescales the axes
+    LIMIT_TOLERANCE = 0.2
+
+    def __init__(self, figure):
+        self.figure = figure
+        self.ax1 = figure.add_subplot(2, 1, 1)  # Top subplot
+        self.ax2 = figure.add_subplot(2, 1, 2)  # Bottom subplot
+        self.ax1.sharex(self.ax2)  # Share x-axis
+        self._background = None
+        self._capturing = False
+        self._layout = None
+        self._limits = None
+        self._updating = False
+        self.decimator = LineDecimator()
+
+        # First subplot (House buying costs)
+        ax1 = self.ax1
+        self.principle_line, = ax1.plot([], [], lw=2, label='Principle Repayment')
+        self.interest_line, = ax1.plot([], [], lw=2, label="Interest Repayment")
+        self.total_cost_line, = ax1.plot([], [], lw=2, label="Principle + Interest + Misc. + Down payment")
+        self.rent_line, = ax1.plot([], [], lw=2, label="Cumulative Rent")
+        self.valuation_line, = ax1.plot([], [], lw=2, label="House Valuation")
+        self.loan_amount_line = ax1.axhline(0, color="k", linestyle="--", label="Loan Amount")
+        self.practical_cost_line = ax1.axhline(0, color="m", linestyle="-", label="Practical house cost", lw=2)
+        self.raw_cost_line = ax1.axhline(0, color="c", linestyle="-.", label="Raw house cost", lw=1, alpha=0.7)
+        self.extra_cost_line = ax1.axhline(0, color="gray", linestyle="-", label="Extra house buying cost", lw=2)
+        self.pending_loan_line, = ax1.plot([], [], lw=2, label="Pending loan amount")
+        ax1.set_title("House buying costs", fontsize=12)
+        self.legend1 = ax1.legend(loc=0, ncol=2)
+        ax1.grid()
+        ax1.set_ylabel("Amount ($)", fontsize=10)
+
+        # Second subplot (House valuation vs Rent Analysis)
+        ax2 = self.ax2
+        self.loss_line, = ax2.plot([], [], lw=2, label="Negative Profit = (House eval - owed_to_bank - cum. cost)")
+        self.rent_minus_costs_line, = ax2.plot([], [], lw=2, label="Cumulative Rent - Other Costs")
+        self.rent_line2, = ax2.plot([], [], lw=2, label="Cumulative Rent")
+        ax2.axhline(0, color="k", linestyle="--")
+        ax2.set_title("House valuation vs Rent Analysis", fontsize=12)
+        self.legend2 = ax2.legend(loc='upper left')
+        ax2.grid()
+        ax2.set_xlabel("Years", fontsize=10)
+        ax2.set_ylabel("Money lost ($)", fontsize=10)
+
+        self._legend_texts = {
+            line: text for legend in (self.legend1, self.legend2)
+            for line in legend.axes.get_lines() for text in legend.get_texts()
+            if text.get_text() == line.get_label()
+        }
+        self.dynamic_artists = [
+            self.principle_line, self.interest_line, self.total_cost_line, self.rent_line,
+            self.valuation_line, self.loan_amount_line, self.practical_cost_line, self.raw_cost_line,
+            self.extra_cost_line, self.pending_loan_line, self.loss_line, self.rent_minus_costs_line,
+            self.rent_line2, self.legend1, self.legend2,
+        ]
+
+        figure.tight_layout()
+        if figure.canvas is not None:
+            self.connect(figure.canvas)
+
+    def connect(self, canvas):
+        """Listen to draw and resize events of the canvas the figure is shown on"""
+        canvas.mpl_connect('draw_event', self._on_draw)
+        canvas.mpl_connect('resize_event', self._on_resize)
+        # Shared axes only notify the axes the limits were set on
+        for ax in (self.ax1, self.ax2):
+            ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def update(self, schedule, log_scale=True, blit=False, draw=True, timing=NULL_MEASUREMENT):
+        """Show a schedule; blit=True allows a partial redraw when the layout is unchanged.
+
+        With draw=False only the artists and axes are updated, for callers that render the
+        figure themselves, such as savefig.
+        timing receives the 'artists', 'layout' and 'draw'/'blit' stages (see house_calc_instrumentation).
+        """
+        months = schedule.months
+        cumulative_principle = schedule.cumulative_principle
+        cumulative_interest = schedule.cumulative_interest
+        cumulative_rent = schedule.cumulative_rent
+        profit = schedule.profit
+        extra_cost = schedule.extra_cost
+
+        self.decimator.set_data(self.principle_line, months, cumulative_principle)
+        self.decimator.set_data(self.interest_line, months, cumulative_interest)
+        self.decimator.set_data(self.total_cost_line, months,
+                                cumulative_principle + cumulative_interest + schedule.upfront_costs)
+        self.decimator.set_data(self.rent_line, months, cumulative_rent)
+        self.decimator.set_data(self.valuation_line, months, schedule.house_valuation)
+        self.loan_amount_line.set_ydata([schedule.loan_amount] * 2)
+        self.practical_cost_line.set_ydata([schedule.raw_house_cost + schedule.misc_costs] * 2)
+        self.raw_cost_line.set_ydata([schedule.raw_house_cost] * 2)
+        self.extra_cost_line.set_ydata([extra_cost] * 2)
+        self.decimator.set_data(self.pending_loan_line, months, schedule.owed_to_bank)
+        self.decimator.set_data(self.loss_line, months, -profit)
+        self.decimator.set_data(self.rent_minus_costs_line, months, cumulative_rent - schedule.other_costs)
+        self.decimator.set_data(self.rent_line2, months, cumulative_rent)
+        self._set_label(self.interest_line,
+                        "Interest Repayment [" + str(round(schedule.total_interest, 0)) + "]")
+        timing.stage('artists')
+
+        # Axis limits
+        pcidx = min(schedule.payoff_idx + 5 * schedule.periods_per_year, len(months) - 1)  # When payment is complete
+        idx = schedule.breakeven_idx
+        loan_period = int(schedule.scenario['loan_period'])
+        layout = (loan_period, bool(log_scale))
+        limits = (
+            (0, months[pcidx]),
+            (1e4, (schedule.raw_house_cost + extra_cost) * 1.5),
+            (-profit[idx] - (-profit[idx] * 2), -profit[idx] + (-profit[idx] * 2)),
+        )
+
+        if blit and self._background is not None and layout == self._layout and self._limits_close(limits):
+            self.decimator.resample()
+            self._blit()
+            timing.stage('blit')
+            return
+
+        self._layout = layout
+        self._limits = limits
+        self._updating = True
+        try:
+            self.ax1.set_xlim(*limits[0])
+            self.ax1.set_ylim(*limits[1])
+            self.ax2.set_ylim(*limits[2])
+            self.ax1.set_yscale('log' if log_scale else 'linear')
+            # Set common x-axis ticks (only show years)
+            years = np.arange(1, loan_period + 1)
+            self.ax2.set_xticks(years * 12)
+            self.ax2.set_xticklabels(years)
+        finally:
+            self._updating = False
+        self.decimator.resample()
+        timing.stage('layout')
+        if not draw:
+            self._background = None
+            return
+        self.redraw()
+        timing.stage('draw')
+
+    def redraw(self):
+        """Full draw of the figure, caching the background without the data lines for blitting"""
+        canvas = self.figure.canvas
+        if not hasattr(canvas, 'copy_from_bbox'):
+            canvas.draw()
+            return
+        for artist in self.dynamic_artists:
+            artist.set_visible(False)
+        self._capturing = True
+        try:
+            canvas.draw()
+        finally:
+            self._capturing = False
+            for artist in self.dynamic_artists:
+                artist.set_visible(True)
+        self._background = canvas.copy_from_bbox(self.figure.bbox)
+        self._blit()
+
+    def _blit(self):
+        canvas = self.figure.canvas
+        canvas.restore_region(self._background)
+        for artist in self.dynamic_artists:
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.figure.bbox)
+
+    def _limits_close(self, limits):
+        """Whether the target limits are within tolerance of those of the last full redraw"""
+        for (low, high), (new_low, new_high) in zip(self._limits, limits):
+            span = abs(high - low)
+            if abs(new_low - low) > self.LIMIT_TOLERANCE * span or abs(new_high - high) > self.LIMIT_TOLERANCE * span:
+                return False
+        return True
+
+    def _set_label(self, line, label):
+        """Change a line label, touching the legend text only if it differs"""
+        if line.get_label() == label:
+            return
+        line.set_label(label)
+        self._legend_texts[line].set_text(label)
+
+    def _on_draw(self, event):
+        # A draw we did not start (toolbar zoom/pan, window expose) invalidates the background
+        if not self._capturing:
+            self._background = None
+
+    def _on_resize(self, event):
+        self.figure.tight_layout()
+        self.decimator.resample()
+        self._background = None
+
+    def _on_xlim_changed(self, ax):
+        # Toolbar zoom and pan: show the points of the new view (the x axis is shared)
+        if not self._updating:
+            self.decimator.resample()
+
+
+class SensitivityPlot:
+    """Heatmap of a metric over two inputs (left) and tornado bars of all inputs (right).
+
+    The image, the colorbar, the current-scenario marker and the bars are created once and
+    only their data changes. The heatmap, the marker and the bars are updated separately, so
+    moving the current scenario within the heatmap does not touch the image.
+    """
+
+    def __init__(self, figure, n_parameters=13):
+        self.figure = figure
+        self.ax_heat = figure.add_subplot(1, 2, 1)
+        self.ax_tornado = figure.add_subplot(1, 2, 2)
+
+        self.image = self.ax_heat.imshow(np.zeros((2, 2)), origin='lower', aspect='auto',
+                                         interpolation='nearest', extent=(0, 1, 0, 1))
+        self.colorbar = figure.colorbar(self.image, ax=self.ax_heat)
+        self.marker, = self.ax_heat.plot([], [], '+', color='w', ms=16, mew=2, label="Current scenario")
+
+        positions = np.arange(n_parameters)
+        self.low_bars = self.ax_tornado.barh(positions, np.zeros(n_parameters), color='tab:blue', label="Input lowered")
+        self.high_bars = self.ax_tornado.barh(positions, np.zeros(n_parameters), color='tab:orange', label="Input raised")
+        self.ax_tornado.axvline(0, color='k', lw=1)
+        self.ax_tornado.set_yticks(positions)
+        self.ax_tornado.set_ylim(n_parameters - 0.5, -0.5)  # Largest swing on top
+        self.ax_tornado.legend(loc='lower right')
+        self.ax_tornado.grid(axis='x')
+        self._layout_done = False
+        self._heatmap_labels = None
+        if figure.canvas is not None:
+            figure.canvas.mpl_connect('resize_event', lambda event: figure.tight_layout())
+
+    def update_heatmap(self, grid, x_parameter, x_values, y_parameter, y_values, metric):
+        """Show a (len(y_values), len(x_values)) metric grid"""
+        extent = _edges(x_values) + _edges(y_values)
+        self.image.set_data(grid)
+        self.image.set_extent(extent)
+        finite = grid[np.isfinite(grid)]
+        if finite.size:
+            self.image.set_clim(finite.min(), finite.max())
+        self.ax_heat.set_xlim(*extent[:2])
+        self.ax_heat.set_ylim(*extent[2:])
+        if self._heatmap_labels != (x_parameter, y_parameter, metric):
+            self._heatmap_labels = (x_parameter, y_parameter, metric)
+            self.ax_heat.set_xlabel(x_parameter, fontsize=10)
+            self.ax_heat.set_ylabel(y_parameter, fontsize=10)
+            self.ax_heat.set_title(f"{metric} by {x_parameter} and {y_parameter}", fontsize=12)
+            self.colorbar.set_label(metric)
+            self.figure.tight_layout()
+
+    def update_marker(self, x, y):
+        """Move the marker of the current scenario"""
+        self.marker.set_data([x], [y])
+
+    def update_tornado(self, bars, metric):
+        """Show the output of house_calc_sensitivity.tornado"""
+        labels = []
+        largest = 0.
+        for low_bar, high_bar, (parameter, low_value, high_value, low_metric, high_metric, base_metric) in zip(
+                self.low_bars, self.high_bars, bars):
+            low_bar.set_width(low_metric - base_metric)
+            high_bar.set_width(high_metric - base_metric)
+            largest = max(largest, abs(low_metric - base_metric), abs(high_metric - base_metric))
+            labels.append(f"{parameter} ({low_value:g} / {high_value:g})")
+        self.ax_tornado.set_yticklabels(labels, fontsize=8)
+        largest = largest * 1.1 or 1.
+        self.ax_tornado.set_xlim(-largest, largest)
+        self.ax_tornado.set_title(f"Change of {metric} [{bars[0][5]:,.1f}]", fontsize=12)
+        # Lay out once the tick labels exist; later labels have about the same width
+        if not self._layout_done:
+            self.figure.tight_layout()
+            self._layout_done = True
+
+
+class ComparisonPlot:
+    """Cumulative cost curves of several schedules, drawn as a single LineCollection.
+
+    The curves are decimated to the axes width like the lines of SchedulePlot; with many
+    curves the resolution drops further to keep to MAX_VERTICES, but not below a year.
+    """
+
+    # Above this many curves the legend would hide the plot
+    MAX_LEGEND = 10
+
+    # Points drawn for all the curves together
+    MAX_VERTICES = 200000
+
+    def __init__(self, figure, subplot=(1, 1, 1)):
+        self.figure = figure
+        self.ax = figure.add_subplot(*subplot)
+        self.curves = LineCollection([], lw=1.5)
+        self.ax.add_collection(self.curves)
+        self.legend = None
+        self._curves = []
+        self._view = None
+        self.ax.callbacks.connect('xlim_changed', lambda ax: self.resample())
+        if figure.canvas is not None:
+            figure.canvas.mpl_connect('resize_event', lambda event: self.resample())
+        self.ax.set_title("Principle + Interest + Misc. + Down payment", fontsize=12)
+        self.ax.set_xlabel("Years", fontsize=10)
+        self.ax.set_ylabel("Amount ($)", fontsize=10)
+        self.ax.grid()
+        figure.tight_layout()
+
+    def update(self, names, schedules):
+        """Show the cumulative costs of the schedules, labelled with names"""
+        self._curves = [(schedule.months / 12.,
+                         schedule.cumulative_principle + schedule.cumulative_interest + schedule.upfront_costs)
+                        for schedule in schedules]
+        self._view = None
+        colors = [colormaps['tab10'](i % 10) for i in range(len(self._curves))]
+        self.curves.set_color(colors)
+
+        if self.legend is not None:
+            self.legend.remove()
+            self.legend = None
+        if 0 < len(names) <= self.MAX_LEGEND:
+            handles = [Line2D([], [], color=color, lw=1.5, label=name) for name, color in zip(names, colors)]
+            self.legend = self.ax.legend(handles=handles, loc='upper left')
+
+        if self._curves:
+            self.ax.set_xlim(0, max(years[-1] for years, _ in self._curves))
+            self.ax.set_ylim(0, max(costs.max() for _, costs in self._curves) * 1.05)
+        self.resample()
+
+    def resample(self):
+        """Decimate the curves to the current x limits and axes width, if either changed"""
+        view = (tuple(self.ax.get_xlim()), int(self.ax.get_window_extent().width))
+        if view == self._view:
+            return
+        self._view = view
+        n_buckets = view[1] // PIXELS_PER_BUCKET
+        if self._curves:
+            n_buckets = min(n_buckets, max(self.MAX_VERTICES // (4 * len(self._curves)), 1))
+        segments = []
+        for years, costs in self._curves:
+            per_year = int(round(1. / (years[1] - years[0]))) if len(years) > 1 else 1
+            segments.append(np.column_stack(decimate(years, costs, view[0], n_buckets, max_bucket=per_year)))
+        self.curves.set_segments(segments)
+
+
+class PortfolioPlot:
+    """Combined monthly outflow (top) and debt, equity and rent-vs-buy (bottom) of a Portfolio.
+
+    The lines are created once and update() only replaces their data, decimated to the axes
+    width and resampled on zoom and pan as in SchedulePlot; purchase months are marked with
+    one LineCollection of vertical lines.
+    """
+
+    def __init__(self, figure):
+        self.figure = figure
+        self.ax1 = figure.add_subplot(2, 1, 1)
+        self.ax2 = figure.add_subplot(2, 1, 2, sharex=self.ax1)
+        self.decimator = LineDecimator()
+        for ax in (self.ax1, self.ax2):
+            ax.callbacks.connect('xlim_changed', lambda ax: self.decimator.resample())
+        if figure.canvas is not None:
+            figure.canvas.mpl_connect('resize_event', lambda event: self.decimator.resample())
+
+        ax1 = self.ax1
+        self.outflow_line, = ax1.plot([], [], lw=1.5, label="Monthly outflow")
+        self.interest_line, = ax1.plot([], [], lw=1.5, label="Interest per month")
+        self.purchases = LineCollection([], colors='gray', linestyles=':', lw=1)
+        ax1.add_collection(self.purchases)
+        ax1.set_title("Combined monthly outflow (loan payments + other costs, upfront costs at purchase)", fontsize=12)
+        ax1.set_ylabel("Amount ($)", fontsize=10)
+        ax1.legend(loc='upper right')
+        ax1.grid()
+
+        ax2 = self.ax2
+        self.debt_line, = ax2.plot([], [], lw=2, label="Total debt")
+        self.equity_line, = ax2.plot([], [], lw=2, label="Equity (valuation - debt)")
+        self.loss_line, = ax2.plot([], [], lw=2, label="Negative Profit")
+        self.rent_minus_costs_line, = ax2.plot([], [], lw=2, label="Cumulative Rent - Other Costs")
+        self.breakeven_line = ax2.axvline(0, color='k', linestyle='--', lw=1, label="Break-even vs. renting")
+        ax2.axhline(0, color='k', lw=0.5)
+        ax2.set_title("Debt, equity and rent-vs-buy of the portfolio", fontsize=12)
+        ax2.set_xlabel("Years", fontsize=10)
+        ax2.set_ylabel("Amount ($)", fontsize=10)
+        ax2.legend(loc='upper left')
+        ax2.grid()
+        figure.tight_layout()
+
+    def update(self, portfolio):
+        """Show a Portfolio, or clear the plot for None"""
+        if portfolio is None:
+            for line in (self.outflow_line, self.interest_line, self.debt_line, self.equity_line, self.loss_line,
+                         self.rent_minus_costs_line):
+                self.decimator.set_data(line, [], [])
+            self.decimator.resample()
+            self.purchases.set_segments([])
+            return
+        years = portfolio.months / 12.
+        self.decimator.set_data(self.outflow_line, years, portfolio.outflow)
+        self.decimator.set_data(self.interest_line, years, portfolio.interest_repayment)
+        self.decimator.set_data(self.debt_line, years, portfolio.owed_to_bank)
+        self.decimator.set_data(self.equity_line, years, portfolio.equity)
+        self.decimator.set_data(self.loss_line, years, -portfolio.profit)
+        self.decimator.set_data(self.rent_minus_costs_line, years, portfolio.cumulative_rent - portfolio.other_costs)
+        breakeven = years[portfolio.breakeven_idx]
+        self.breakeven_line.set_xdata([breakeven, breakeven])
+
+        # The upfront costs make purchase months spikes; scale to the regular payments instead
+        regular = np.percentile(portfolio.outflow, 99) if len(portfolio.outflow) > 100 else portfolio.outflow.max()
+        top = max(regular, portfolio.interest_repayment.max()) * 1.2 or 1.
+        self.purchases.set_segments([((start / 12., 0), (start / 12., top)) for start in portfolio.start_months])
+        self.ax1.set_xlim(0, years[-1])
+        self.ax1.set_ylim(0, top)
+        lines = (portfolio.owed_to_bank, portfolio.equity, -portfolio.profit,
+                 portfolio.cumulative_rent - portfolio.other_costs)
+        low = min(line.min() for line in lines)
+        high = max(line.max() for line in lines)
+        margin = (high - low) * 0.05 or 1.
+        self.ax2.set_ylim(low - margin, high + margin)
+        self.decimator.resample()
+
+
+def _edges(values):
+    """Outer pixel edges of evenly spaced values, as (first, last) for an image extent"""
+    if len(values) < 2:
+        return (values[0] - 0.5, values[0] + 0.5)
+    half_step = (values[-1] - values[0]) / (len(values) - 1) / 2
+    return (values[0] - half_step, values[-1] + half_step)
@@ -0,0 +1,170 @@
+"""Several properties bought at different times, aggregated onto one monthly cash-flow timeline"""
+import argparse
+import time
+
+import numpy as np
+
+from house_calc_engine import (_amortize, _as_arrays, _breakeven_idx, _rent_vs_buy, _upfront, compute_schedule,
+                               contract_terms, stack_scenarios)
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+# Series of every property on the common timeline, stacked as (properties x months) in Portfolio.stacked
+PORTFOLIO_SERIES = (
+    'outflow',
+    'interest_repayment',
+    'principle_repayment',
+    'owed_to_bank',
+    'house_valuation',
+    'cumulative_rent',
+    'other_costs',
+    'profit',
+)
+
+
+class Portfolio:
+    """Combined schedule of several properties on a common monthly timeline.
+
+    Property i is bought start_months[i] months after the start of the timeline and pays its
+    first installment the month after. stacked maps each of PORTFOLIO_SERIES to a (properties
+    x months) array, zero before a purchase; the attributes of the same names hold the sums
+    over the properties. A property's loan ends with its loan period, but its valuation, rent
+    and other costs carry on to the end of the timeline.
+    """
+
+    def __init__(self, names, scenarios, start_months, n_months=None):
+        if not scenarios:
+            raise ValueError("A portfolio needs at least one scenario")
+        if len(names) != len(scenarios) or len(start_months) != len(scenarios):
+            raise ValueError(f"Got {len(names)} names and {len(start_months)} start months "
+                             f"for {len(scenarios)} scenarios")
+        start = np.asarray(start_months, dtype=int)
+        if np.any(start < 0):
+            raise ValueError("Start months must not be negative")
+
+        self.names = list(names)
+        self.start_months = start
+        self.stacked = _stacked_series(scenarios, start, n_months)
+        self.months = np.arange(1, self.stacked['outflow'].shape[1] + 1, dtype=float)
+        for key, block in self.stacked.items():
+            setattr(self, key, block.sum(axis=0))
+
+        self.cumulative_outflow = np.cumsum(self.outflow)
+        self.equity = self.house_valuation - self.owed_to_bank
+        self.total_interest = float(self.interest_repayment.sum())
+        self.peak_debt = float(self.owed_to_bank.max())
+        self.peak_outflow = float(self.outflow.max())
+        in_debt = np.flatnonzero(self.owed_to_bank > 1e-6)
+        self.payoff_idx = int(in_debt[-1]) + 1 if len(in_debt) else 0
+        self.payoff_idx = min(self.payoff_idx, len(self.months) - 1)
+
+        # Renting all the properties instead, as for a single schedule
+        combined = {key: getattr(self, key)[None, :] for key in ('profit', 'cumulative_rent', 'other_costs')}
+        self.breakeven_idx = int(_breakeven_idx(combined, np.array([len(self.months)]))[0])
+
+    def __len__(self):
+        return len(self.names)
+
+
+def compute_portfolio(named_scenarios, n_months=None):
+    """Portfolio of (name, scenario, start_month) triples; n_months fixes the timeline length"""
+    names, scenarios, start_months = zip(*named_scenarios) if named_scenarios else ((), (), ())
+    return Portfolio(names, scenarios, start_months, n_months)
+
+
+def _stacked_series(scenarios, start, n_months=None):
+    """The PORTFOLIO_SERIES of all properties in one batch, shifted onto the common timeline.
+
+    The schedules are computed by property age (months since purchase) over the whole
+    timeline, as one (properties x months) batch; scenarios with contract terms replace their
+    rows with compute_schedule. Each row is then moved right by its start month with a
+    single gather.
+    """
+    params = _as_arrays(stack_scenarios(scenarios))
+    costs = _upfront(params)
+    loan_months = params['loan_period'] * 12
+    width = int((start + loan_months).max()) if n_months is None else int(n_months)
+    ages = np.arange(1, width + 1, dtype=float)
+
+    repayments, interest_repayment, principle_repayment, _ = _amortize(params, costs, loan_months, width)
+    for i, scenario in enumerate(scenarios):
+        if contract_terms(scenario):
+            if int(contract_terms(scenario).get('periods_per_year', 12)) != 12:
+                raise ValueError(f"Scenario {i} is not monthly; only monthly schedules can be combined")
+            schedule = compute_schedule(scenario)
+            n = min(len(schedule.months), width)
+            for block, series in ((repayments, schedule.repayments), (interest_repayment, schedule.interest_repayment),
+                                  (principle_repayment, schedule.principle_repayment)):
+                block[i] = 0.
+                block[i, :n] = series[:n]
+    rent = _rent_vs_buy(params, costs, interest_repayment, principle_repayment, ages)
+
+    # Cash leaving per month: the upfront costs in the first month, loan payments and other costs
+    outflow = repayments + np.diff(rent['other_costs'], axis=1, prepend=0.)
+    outflow[:, 0] += costs['upfront_costs']
+    by_age = {
+        'outflow': outflow,
+        'interest_repayment': interest_repayment,
+        'principle_repayment': principle_repayment,
+        'owed_to_bank': rent['owed_to_bank'],
+        'house_valuation': rent['house_valuation'],
+        'cumulative_rent': rent['cumulative_rent'],
+        'other_costs': rent['other_costs'],
+        'profit': rent['profit'],
+    }
+
+    # Timeline month t holds age t - start; nothing is owned before the purchase
+    age_idx = np.arange(width)[None, :] - start[:, None]
+    owned = age_idx >= 0
+    age_idx = np.clip(age_idx, 0, width - 1)
+    return {key: np.where(owned, np.take_along_axis(block, age_idx, axis=1), 0.) for key, block in by_age.items()}
+
+
+def parse_member(text):
+    """'name' or 'name@start_month' as (name, start_month)"""
+    name, separator, start = text.rpartition('@')
+    if not separator:
+        return text, 0
+    try:
+        return name, int(start)
+    except ValueError:
+        return text, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine saved scenarios bought at different times into one timeline")
+    parser.add_argument('members', nargs='+', metavar='NAME[@MONTH]',
+                        help="Saved scenario and the month it is bought in, counted from the first purchase")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite)")
+    parser.add_argument('--years', type=int, help="Length of the timeline (default: until the last loan ends)")
+    args = parser.parse_args()
+
+    members = []
+    with open_store(args.scenarios) as store:
+        for text in args.members:
+            name, start_month = parse_member(text)
+            if name not in store:
+                parser.error(f"no scenario named '{name}' in {args.scenarios}")
+            members.append((name, store[name], start_month))
+
+    start = time.perf_counter()
+    try:
+        portfolio = compute_portfolio(members, None if args.years is None else args.years * 12)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(portfolio)} properties over {len(portfolio.months) / 12:.1f} years ({elapsed * 1000:.1f} ms)")
+    print(f"Peak monthly outflow: ${portfolio.peak_outflow:,.2f}")
+    print(f"Peak debt: ${portfolio.peak_debt:,.2f}, debt-free in year {portfolio.months[portfolio.payoff_idx] / 12:.1f}")
+    print(f"Total interest: ${portfolio.total_interest:,.2f}")
+    print(f"Equity at the end: ${portfolio.equity[-1]:,.2f}")
+    print(f"Break-even vs. renting: year {portfolio.months[portfolio.breakeven_idx] / 12:.1f}")
+    for year in range(5, len(portfolio.months) // 12 + 1, 5):
+        i = year * 12 - 1
+        print(f"Year {year:2d}: outflow/month {portfolio.outflow[i]:10,.2f}  debt {portfolio.owed_to_bank[i]:13,.2f}  "
+              f"equity {portfolio.equity[i]:13,.2f}  profit {portfolio.profit[i]:13,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Headless rendering of the schedule figure of every saved scenario, plus a comparison page"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+FORMATS = ('png', 'pdf')
+
+# Rows of the summary table on the comparison page, cheapest first; all rows go to the CSV
+MAX_TABLE_ROWS = 25
+
+TABLE_COLUMNS = (
+    ('name', "Scenario", '{}'),
+    ('effective_cost', "Effective cost", '{:,.0f}'),
+    ('extra_cost', "Extra cost", '{:,.0f}'),
+    ('monthly_repayment', "Monthly", '{:,.0f}'),
+    ('total_interest', "Interest", '{:,.0f}'),
+    ('payoff_month', "Payoff year", '{:.1f}'),
+    ('breakeven_month', "Breakeven year", '{:.1f}'),
+)
+
+# savefig options per format; fast PNG compression halves the encode time for ~10% larger files
+SAVE_OPTIONS = {
+    'png': {'pil_kwargs': {'compress_level': 1}},
+    'pdf': {},
+}
+
+# Figure of the current worker process, created once by _init_worker and reused for every page
+_report_plot = None
+
+
+class ReportPlot:
+    """The two-panel SchedulePlot of the GUI on an offscreen Agg canvas, with a title line"""
+
+    def __init__(self, figsize=(12, 8), dpi=100):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from house_calc_plot import SchedulePlot
+
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.title = self.figure.suptitle('', fontsize=13)
+        self.plot = SchedulePlot(self.figure)
+        self.figure.tight_layout(rect=(0, 0, 1, 0.96))
+
+    def render(self, name, scenario, paths):
+        """Draw the schedule of a scenario once per path; the format follows the extension"""
+        from house_calc_engine import compute_schedule
+
+        schedule = compute_schedule(scenario)
+        self.plot.update(schedule, draw=False)
+        self.title.set_text(f"{name}: effective cost ${schedule.effective_cost:,.0f}, "
+                            f"extra cost ${schedule.extra_cost:,.0f} ({schedule.extra_cost_perc:.1f}%), "
+                            f"monthly ${schedule.monthly_repayment:,.0f}")
+        for path in paths:
+            self.figure.savefig(path, **_save_options(path))
+
+
+def render_reports(scenarios, directory, formats=('png',), processes=None, comparison=True, figsize=(12, 8), dpi=100):
+    """Render every scenario of a {name: scenario} mapping into directory.
+
+    Each worker process creates one figure and reuses its artists for all the scenarios it
+    is given, so a page costs one update and one savefig. Work is split into a few chunks
+    per worker to even out the load. Returns the list of written files.
+    """
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(name, scenario, [os.path.join(directory, f"{filename}.{fmt}") for fmt in formats])
+             for (name, scenario), filename in zip(scenarios.items(), _filenames(scenarios))]
+
+    written = []
+    if processes == 1 or len(tasks) < 2:
+        _init_worker(figsize, dpi)
+        written.extend(_render_chunk(tasks))
+    else:
+        processes = processes or os.cpu_count() or 1
+        n_chunks = min(len(tasks), 4 * processes)
+        chunks = [tasks[i::n_chunks] for i in range(n_chunks)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(figsize, dpi)) as executor:
+            for paths in executor.map(_render_chunk, chunks):
+                written.extend(paths)
+
+    if comparison and scenarios:
+        written.extend(render_comparison(scenarios, directory, formats, figsize, dpi))
+    return written
+
+
+def render_comparison(scenarios, directory, formats=('png',), figsize=(12, 8), dpi=100):
+    """Comparison page: cumulative cost curves and the cheapest scenarios, plus comparison.csv"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from house_calc_batch import CsvWriter, evaluate_chunk
+    from house_calc_engine import compute_schedule
+    from house_calc_plot import ComparisonPlot
+
+    os.makedirs(directory, exist_ok=True)
+    names = list(scenarios)
+    columns = evaluate_chunk(names, list(scenarios.values()))
+    csv_path = os.path.join(directory, 'comparison.csv')
+    with open(csv_path, 'w', newline='') as f:
+        CsvWriter(f)(columns)
+
+    order = sorted(range(len(names)), key=lambda i: columns['effective_cost'][i])[:MAX_TABLE_ROWS]
+    cells = []
+    for i in order:
+        row = []
+        for key, _, fmt in TABLE_COLUMNS:
+            value = columns[key][i]
+            row.append(fmt.format(value / 12. if key.endswith('_month') else value))
+        cells.append(row)
+
+    # The table panel grows with its rows, a quarter inch each
+    table_height = 0.25 * (len(cells) + 1) + 0.5
+    figure = Figure(figsize=(figsize[0], figsize[1] + table_height), dpi=dpi)
+    FigureCanvasAgg(figure)
+    grid = figure.add_gridspec(2, 1, height_ratios=(figsize[1], table_height))
+    plot = ComparisonPlot(figure, subplot=(grid[0],))
+    plot.update(names, [compute_schedule(scenario) for scenario in scenarios.values()])
+
+    table_ax = figure.add_subplot(grid[1])
+    table_ax.axis('off')
+    table_ax.set_title(f"{len(order)} of {len(names)} scenarios, cheapest first (all in comparison.csv)", fontsize=11)
+    table = table_ax.table(cellText=cells, colLabels=[label for _, label, _ in TABLE_COLUMNS], bbox=(0, 0, 1, 1))
+    table.auto_set_font_size(False)
+    table.set_fontsize(9)
+    figure.tight_layout()
+
+    paths = [os.path.join(directory, f"comparison.{fmt}") for fmt in formats]
+    for path in paths:
+        figure.savefig(path, **_save_options(path))
+    return paths + [csv_path]
+
+
+def _init_worker(figsize, dpi):
+    global _report_plot
+    _report_plot = ReportPlot(figsize, dpi)
+
+
+def _render_chunk(tasks):
+    written = []
+    for name, scenario, paths in tasks:
+        _report_plot.render(name, scenario, paths)
+        written.extend(paths)
+    return written
+
+
+def _save_options(path):
+    return SAVE_OPTIONS[os.path.splitext(path)[1][1:]]
+
+
+def _filenames(scenarios):
+    """File name stem of each scenario name, made unique"""
+    used = set()
+    for name in scenarios:
+        stem = re.sub(r'[^\w.-]+', '_', str(name)).strip('_.') or 'scenario'
+        filename, i = stem, 1
+        while filename.lower() in used or filename.lower() == 'comparison':
+            i += 1
+            filename = f"{stem}_{i}"
+        used.add(filename.lower())
+        yield filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the schedule figure of every saved scenario without the GUI")
+    parser.add_argument('scenarios', nargs='?', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite)")
+    parser.add_argument('-o', '--output', default='house_calc_reports', help="Output directory")
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['png'])
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--no-comparison', action='store_true', help="Skip the comparison page")
+    args = parser.parse_args()
+
+    with open_store(args.scenarios) as store:
+        scenarios = dict(store)
+    start = time.perf_counter()
+    written = render_reports(scenarios, args.output, args.format, args.processes, not args.no_comparison, dpi=args.dpi)
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {len(scenarios)} scenarios ({len(written)} files) to {args.output} in {elapsed:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
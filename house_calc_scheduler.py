@@ -0,0 +1,102 @@
+"""Debounced background recomputation for the Tk GUI"""
+import queue
+import threading
+
+
+class CoalescingScheduler:
+    """Run compute(request) on a worker thread and hand only the latest result to apply(result).
+
+    Requests arriving within debounce_ms of each other are coalesced, requests that arrive
+    while the worker is busy replace each other so that at most one is queued, and results
+    of stale requests are dropped. apply is always called on the Tk main loop; the worker
+    never touches Tk, results are passed back through a queue polled with root.after.
+    An exception raised by compute for the latest request is passed to on_error(exception)
+    on the main loop, or re-raised there if on_error is None.
+    """
+
+    def __init__(self, root, compute, apply, debounce_ms=30, poll_ms=10, on_error=None):
+        self.root = root
+        self.compute = compute
+        self.apply = apply
+        self.on_error = on_error
+        self.debounce_ms = debounce_ms
+        self.poll_ms = poll_ms
+
+        self._generation = 0
+        self._pending = None
+        self._debounce_id = None
+        self._poll_id = None
+        self._busy = False
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def request(self, args):
+        """Schedule compute(args), superseding any request that has not been applied yet"""
+        self._generation += 1
+        self._pending = (self._generation, args)
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+        self._debounce_id = self.root.after(self.debounce_ms, self._dispatch)
+
+    def discard(self):
+        """Never apply the requests made so far, e.g. when the caller has computed a newer result itself.
+
+        A request already running finishes in the background and its result is dropped.
+        """
+        self._generation += 1
+        self._pending = None
+        if self._debounce_id is not None:
+            self.root.after_cancel(self._debounce_id)
+            self._debounce_id = None
+
+    def cancel(self):
+        """Drop pending work and stop polling, e.g. when the window is destroyed"""
+        self.discard()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    def close(self):
+        """Cancel pending work and let the worker thread exit once it is idle"""
+        self.cancel()
+        self._requests.put(None)
+
+    def _dispatch(self):
+        self._debounce_id = None
+        if self._busy or self._pending is None:
+            return
+        self._busy = True
+        self._requests.put(self._pending)
+        self._pending = None
+        self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        try:
+            generation, result, error = self._results.get_nowait()
+        except queue.Empty:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+            return
+        self._poll_id = None
+        self._busy = False
+        if generation == self._generation:
+            if error is None:
+                self.apply(result)
+            elif self.on_error is None:
+                raise error
+            else:
+                self.on_error(error)
+        elif self._pending is not None and self._debounce_id is None:
+            self._dispatch()
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            generation, args = request
+            try:
+                self._results.put((generation, self.compute(args), None))
+            except Exception as e:
+                self._results.put((generation, None, e))
@@ -0,0 +1,85 @@
+"""Two-parameter heatmaps and one-at-a-time sensitivity of a scenario, each from one batch evaluation"""
+import numpy as np
+
+from house_calc_engine import SCENARIO_KEYS, evaluate_batch, scenario_grid
+
+# Slider ranges of the GUI, used as heatmap axes and to size the sensitivity steps
+PARAMETER_RANGES = {
+    'raw_house_cost': (100000, 1000000),
+    'mortgage_rate': (1, 10),
+    'down_payment': (0, 100000),
+    'broker_commission': (0, 10),
+    'notary': (0, 5),
+    'land_registry': (0, 5),
+    'land_transfer_tax': (0, 10),
+    'yearly_repayment': (0, 10),
+    'loan_period': (10, 50),
+    'nebenkosten': (0, 2000),
+    'monthly_rent': (500, 3000),
+    'inflation': (0, 10),
+    'house_inflation': (0, 10),
+}
+
+# Metrics that can be shown, computed from the evaluate_batch results
+SENSITIVITY_METRICS = {
+    'effective_cost': lambda metrics: metrics['effective_cost'],
+    'extra_cost': lambda metrics: metrics['extra_cost'],
+    'total_interest': lambda metrics: metrics['total_interest'],
+    'monthly_repayment': lambda metrics: metrics['monthly_repayment'],
+    'breakeven_year': lambda metrics: metrics['breakeven_month'] / 12.,
+    'payoff_year': lambda metrics: metrics['payoff_month'] / 12.,
+}
+
+
+def axis_values(parameter, resolution, lo=None, hi=None):
+    """Evenly spaced values of a parameter over its slider range (whole years for loan_period)"""
+    default_lo, default_hi = PARAMETER_RANGES[parameter]
+    lo = default_lo if lo is None else lo
+    hi = default_hi if hi is None else hi
+    if parameter == 'loan_period':
+        return np.unique(np.round(np.linspace(lo, hi, min(resolution, int(hi - lo) + 1))))
+    return np.linspace(lo, hi, resolution)
+
+
+def heatmap(base, x_parameter, x_values, y_parameter, y_values, metric='effective_cost'):
+    """Metric over a grid of two inputs, as a (len(y_values), len(x_values)) array for imshow"""
+    params = scenario_grid(base, **{y_parameter: y_values, x_parameter: x_values})
+    return SENSITIVITY_METRICS[metric](evaluate_batch(params)).reshape(len(y_values), len(x_values))
+
+
+def heatmap_key(base, x_parameter, y_parameter, metric, resolution):
+    """Everything a heatmap depends on; scenarios differing only along the two axes share it"""
+    others = tuple(float(base[key]) for key in SCENARIO_KEYS if key not in (x_parameter, y_parameter))
+    return x_parameter, y_parameter, metric, resolution, others
+
+
+def tornado(base, metric='effective_cost', step=0.1):
+    """Change of metric when each input alone moves down and up by step of its slider range.
+
+    Steps are clipped to the slider range, widened to include a base value outside it, and
+    loan_period moves by at least one year.
+    Returns a list of (parameter, low_value, high_value, low_metric, high_metric, base_metric)
+    sorted by the size of the swing, largest first, from one evaluate_batch call of
+    2 * 13 + 1 scenarios.
+    """
+    n_keys = len(SCENARIO_KEYS)
+    params = {key: np.full(2 * n_keys + 1, float(base[key])) for key in SCENARIO_KEYS}
+    values = []
+    for i, key in enumerate(SCENARIO_KEYS):
+        lo, hi = PARAMETER_RANGES[key]
+        delta = step * (hi - lo)
+        if key == 'loan_period':
+            delta = max(round(delta), 1)
+        value = float(base[key])
+        low_value = max(value - delta, min(lo, value))
+        high_value = min(value + delta, max(hi, value))
+        params[key][2 * i] = low_value
+        params[key][2 * i + 1] = high_value
+        values.append((low_value, high_value))
+
+    results = SENSITIVITY_METRICS[metric](evaluate_batch(params))
+    base_metric = results[-1]
+    bars = [(key, low_value, high_value, results[2 * i], results[2 * i + 1], base_metric)
+            for i, (key, (low_value, high_value)) in enumerate(zip(SCENARIO_KEYS, values))]
+    bars.sort(key=lambda bar: -abs(bar[4] - bar[3]))
+    return bars
@@ -0,0 +1,336 @@
+"""Local HTTP/JSON service around the engine, for tools that need results without the Tk app.
+
+Endpoints (all responses are JSON):
+    GET  /health               status and cache counters
+    POST /schedule             one scenario -> summary row; ?series=1 adds the monthly series
+    POST /batch                {"scenarios": [scenario, ...] or {name: scenario}} -> summary rows
+    GET  /scenarios            names in the scenario file
+    GET  /scenarios/<name>     a saved scenario and its summary row
+
+Summary rows carry the COLUMNS of house_calc_batch, the figures of the Cost Summary box and
+the comparison window. Rows are cached on scenario_key, so repeated parameter sets are
+answered without recomputing; large batches of new scenarios run on a process pool.
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from house_calc_batch import COLUMNS, evaluate_chunk
+from house_calc_engine import CONTRACT_KEYS, SCENARIO_KEYS, ScheduleCache, scenario_key
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+# Series returned by /schedule?series=1, as in the schedule plots
+SERIES = (
+    'months',
+    'principle_repayment',
+    'interest_repayment',
+    'owed_to_bank',
+    'house_valuation',
+    'cumulative_rent',
+    'profit',
+)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+MAX_BODY = 64 * 2 ** 20
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class CalculationService:
+    """The endpoint handlers, independent of the HTTP transport.
+
+    Batches with more than inline_limit uncached scenarios are split into chunks of
+    chunk_size and evaluated on a process pool; smaller ones are evaluated on the event
+    loop, where a few hundred rows take about a millisecond.
+    """
+
+    def __init__(self, scenario_file=DEFAULT_SCENARIO_FILE, processes=None, cache_size=100000,
+                 inline_limit=512, chunk_size=2000):
+        self.scenario_file = scenario_file
+        self.processes = processes
+        self.cache_size = cache_size
+        self.inline_limit = inline_limit
+        self.chunk_size = chunk_size
+        self.schedule_cache = ScheduleCache()
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._pool = None
+        self._store = None
+        self._saved = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    async def handle(self, method, path, query, body):
+        """Dispatch a request; returns the JSON-ready response or raises HttpError"""
+        if path == '/health':
+            self._expect(method, 'GET')
+            return {'status': 'ok', 'cache': self.cache_info(), 'schedule_cache': self.schedule_cache.info()}
+        if path == '/schedule':
+            self._expect(method, 'POST')
+            return await self.schedule(_decode(body), query.get('series', ['0'])[0] not in ('0', 'false', ''))
+        if path == '/batch':
+            self._expect(method, 'POST')
+            return await self.batch(_decode(body))
+        if path == '/scenarios':
+            self._expect(method, 'GET')
+            return {'names': sorted(self.saved_scenarios())}
+        if path.startswith('/scenarios/'):
+            self._expect(method, 'GET')
+            return await self.saved(unquote(path[len('/scenarios/'):]))
+        raise HttpError(404, f"No endpoint {path}")
+
+    async def schedule(self, scenario, series=False):
+        _check_scenario(scenario)
+        response = {'row': (await self.rows([scenario]))[0]}
+        if series:
+            schedule = self.schedule_cache.get(scenario)
+            response['series'] = {key: getattr(schedule, key).tolist() for key in SERIES}
+        return response
+
+    async def batch(self, body):
+        scenarios = body.get('scenarios') if isinstance(body, dict) else None
+        if isinstance(scenarios, dict):
+            names, scenarios = list(scenarios), list(scenarios.values())
+        elif isinstance(scenarios, list):
+            names = list(range(len(scenarios)))
+        else:
+            raise HttpError(400, "Expected {\"scenarios\": [...]} or {\"scenarios\": {name: scenario}}")
+        for scenario in scenarios:
+            _check_scenario(scenario)
+        rows = await self.rows(scenarios)
+        for name, row in zip(names, rows):
+            row['name'] = name
+        return {'rows': rows}
+
+    async def saved(self, name):
+        scenarios = self.saved_scenarios()
+        if name not in scenarios:
+            raise HttpError(404, f"No scenario named '{name}' in {self.scenario_file}")
+        scenario = scenarios[name]
+        _check_scenario(scenario)
+        row = (await self.rows([scenario]))[0]
+        row['name'] = name
+        return {'scenario': scenario, 'row': row}
+
+    def saved_scenarios(self):
+        """Contents of the scenario store, kept open and brought up to date with its poll()"""
+        if self._store is None:
+            self._store = open_store(self.scenario_file)
+            self._saved = dict(self._store)
+            return self._saved
+        changes = self._store.poll()
+        for name in changes['removed']:
+            self._saved.pop(name, None)
+        for name in changes['added'] + changes['changed']:
+            self._saved[name] = self._store[name]
+        return self._saved
+
+    async def rows(self, scenarios):
+        """Summary rows of scenarios, computing only those not in the cache.
+
+        The response is built from the rows found and computed for this request, so neither
+        evicting them to keep cache_size nor concurrent requests can remove them.
+        """
+        keys = [scenario_key(scenario) for scenario in scenarios]
+        found = {}
+        missing = {}
+        for key, scenario in zip(keys, scenarios):
+            if key in found or key in missing:
+                continue
+            row = self._rows.get(key)
+            if row is not None:
+                self._rows.move_to_end(key)
+                found[key] = row
+                self.hits += 1
+            else:
+                missing[key] = scenario
+                self.misses += 1
+        if missing:
+            computed = dict(zip(missing, await self._evaluate(list(missing.values()))))
+            found.update(computed)
+            self._rows.update(computed)
+            while len(self._rows) > self.cache_size:
+                self._rows.popitem(last=False)
+        return [dict(found[key]) for key in keys]
+
+    def cache_info(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._rows), 'maxsize': self.cache_size}
+
+    async def _evaluate(self, scenarios):
+        if len(scenarios) <= self.inline_limit:
+            return _rows(evaluate_chunk(range(len(scenarios)), scenarios))
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes)
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self._pool, evaluate_chunk, range(start, start + len(chunk)), chunk)
+                   for start, chunk in _split(scenarios, self.chunk_size)]
+        rows = []
+        for columns in await asyncio.gather(*futures):
+            rows.extend(_rows(columns))
+        return rows
+
+    @staticmethod
+    def _expect(method, allowed):
+        if method != allowed:
+            raise HttpError(405, f"Use {allowed}")
+
+
+def _decode(body):
+    try:
+        return json.loads(body or b'null')
+    except ValueError as e:
+        raise HttpError(400, f"Invalid JSON: {e}")
+
+
+def _check_scenario(scenario):
+    if not isinstance(scenario, dict):
+        raise HttpError(400, "A scenario must be a JSON object")
+    missing = [key for key in SCENARIO_KEYS if key not in scenario]
+    if missing:
+        raise HttpError(400, f"Scenario is missing {', '.join(missing)}")
+    for key in SCENARIO_KEYS:
+        if isinstance(scenario[key], bool) or not isinstance(scenario[key], (int, float)):
+            raise HttpError(400, f"Scenario value '{key}' must be a number")
+        # json.loads accepts NaN and Infinity, which would make the response invalid JSON
+        if not math.isfinite(scenario[key]):
+            raise HttpError(400, f"Scenario value '{key}' must be finite, got {scenario[key]}")
+    for key in CONTRACT_KEYS:
+        if key in scenario:
+            try:
+                finite = np.isfinite(np.asarray(scenario[key], dtype=float)).all()
+            except (TypeError, ValueError):
+                raise HttpError(400, f"Contract term '{key}' must hold numbers")
+            if not finite:
+                raise HttpError(400, f"Contract term '{key}' must hold finite numbers")
+
+
+def _split(items, size):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def _rows(columns):
+    """evaluate_chunk columns as JSON-ready row dictionaries, without the name"""
+    keys = COLUMNS[1:]
+    values = [columns[key].tolist() if isinstance(columns[key], np.ndarray) else list(columns[key]) for key in keys]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+async def _read_request(reader):
+    """(method, target, headers, body) of the next request, or None when the client is done"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise HttpError(400, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    headers['_version'] = version
+    return method, target, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def _serve_client(service, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except HttpError as e:
+                writer.write(_response(e.status, {'error': str(e)}, False))
+                break
+            if request is None:
+                break
+            method, target, headers, body = request
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection == 'keep-alive' or (headers['_version'] == 'HTTP/1.1' and connection != 'close')
+            url = urlsplit(target)
+            try:
+                status, payload = 200, await service.handle(method, url.path, parse_qs(url.query), body)
+            except HttpError as e:
+                status, payload = e.status, {'error': str(e)}
+            except (KeyError, TypeError, ValueError) as e:
+                status, payload = 400, {'error': str(e)}
+            except Exception as e:
+                status, payload = 500, {'error': f"{e.__class__.__name__}: {e}"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8765, ready=None):
+    """Serve until cancelled; ready, if given, is called with the bound port"""
+    server = await asyncio.start_server(lambda reader, writer: _serve_client(service, reader, writer), host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the house cost calculations as a local HTTP/JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (0 for any free port)")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite) for /scenarios")
+    parser.add_argument('--processes', type=int, default=None, help="Worker processes for large batches")
+    parser.add_argument('--cache-size', type=int, default=100000, help="Summary rows kept in the cache")
+    args = parser.parse_args()
+
+    service = CalculationService(args.scenarios, args.processes, args.cache_size)
+
+    def ready(port):
+        print(f"Serving on http://{args.host}:{port}", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Startup-time measurement based on python -X importtime"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Modules measured by default and whether they may pull in the GUI stack
+MODULES = {
+    'house_calc_engine': False,
+    'house_calc_store': False,
+    'house_calc_batch': False,
+    'house_calc_montecarlo': False,
+    'house_calc_goalseek': False,
+    'house_calc_sensitivity': False,
+    'house_calc_export': False,
+    'house_calc_server': False,
+    'house_calc_scenario': False,
+    'house_calc_report': False,
+    'house_calc_optimizer': False,
+    'house_calc_portfolio': False,
+    'new_buy_house_app': True,
+}
+GUI_MODULES = ('matplotlib', 'tkinter')
+
+# Seconds after which a GUI timing run is abandoned
+GUI_TIMEOUT = 60
+
+_GUI_TIMING = """
+import json, time, tkinter as tk
+from new_buy_house_app import HouseCalculatorApp
+start = {start!r}
+times = {{}}
+root = tk.Tk()
+root.bind('<Map>', lambda e: times.setdefault('window_shown', time.time() - start), add='+')
+# Patched on the class: __init__ schedules finish_startup before an instance attribute could be set
+finish_startup = HouseCalculatorApp.finish_startup
+def timed_finish_startup(self):
+    finish_startup(self)
+    self.canvas.get_tk_widget().update_idletasks()
+    times['first_plot'] = time.time() - start
+    self.root.after(1, self.root.destroy)
+HouseCalculatorApp.finish_startup = timed_finish_startup
+app = HouseCalculatorApp(root)
+root.mainloop()
+print(json.dumps(times))
+"""
+
+
+def measure_import(module):
+    """Import a module in a fresh interpreter; returns cumulative import time and imported packages"""
+    code = f"import sys, json, {module}; print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nesting is shown by indentation after the single separating space
+        imports.append((name[1:], int(self_us), int(cumulative_us)))
+    position = max(i for i, (name, _, _) in enumerate(imports) if name == module)
+    total_us = imports[position][2]
+
+    # Direct dependencies are listed just before the module, indented by two spaces
+    children = []
+    for name, _, cumulative in reversed(imports[:position]):
+        if not name.startswith(' '):
+            break
+        if not name.startswith('   '):
+            children.append((name.strip(), cumulative))
+    return {
+        'module': module,
+        'import_ms': total_us / 1000.,
+        'slowest': [{'name': name, 'ms': us / 1000.} for name, us in sorted(children, key=lambda x: -x[1])[:5]],
+        'gui_modules': [name for name in json.loads(result.stdout) if name in GUI_MODULES],
+    }
+
+
+def measure_gui(timeout=GUI_TIMEOUT):
+    """Seconds from launch until the window is mapped and until the first plot is drawn (needs a display).
+
+    Returns {'error': message} if the app fails to start or does not finish within timeout seconds.
+    """
+    start = time.time()
+    try:
+        result = subprocess.run([sys.executable, '-c', _GUI_TIMING.format(start=start)],
+                                capture_output=True, text=True, check=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f"no first plot within {timeout}s"}
+    except subprocess.CalledProcessError as e:
+        lines = e.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else f"exit status {e.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and startup times")
+    parser.add_argument('modules', nargs='*', default=list(MODULES))
+    parser.add_argument('--gui', action='store_true', help="Also time window display and first plot")
+    parser.add_argument('--json', action='store_true', help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {'imports': [measure_import(module) for module in args.modules]}
+    if args.gui:
+        results['gui'] = measure_gui()
+
+    # Headless modules must never import matplotlib or tkinter
+    failures = [r['module'] for r in results['imports'] if r['gui_modules'] and not MODULES.get(r['module'], True)]
+    results['failures'] = failures
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results['imports']:
+            slowest = ', '.join(f"{s['name']} {s['ms']:.0f}ms" for s in r['slowest'][:3])
+            gui = f" [imports {', '.join(r['gui_modules'])}]" if r['gui_modules'] else ""
+            print(f"{r['module']:<24} {r['import_ms']:8.1f} ms  ({slowest}){gui}")
+        if args.gui and 'error' in results['gui']:
+            print(f"GUI timing failed: {results['gui']['error']}", file=sys.stderr)
+        elif args.gui:
+            print(f"Window shown after {results['gui'].get('window_shown', float('nan')):.2f}s, "
+                  f"first plot after {results['gui']['first_plot']:.2f}s")
+        for module in failures:
+            print(f"ERROR: {module} imports the GUI stack", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Scenario storage backends: the original JSON file and an indexed SQLite database"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+from collections.abc import MutableMapping
+
+DEFAULT_SCENARIO_FILE = 'house_calc_scenarios.json'
+
+
+class ScenarioStore(MutableMapping):
+    """Mapping of scenario name to scenario dictionary, persisted on every change"""
+
+    def poll(self):
+        """{'added': [...], 'changed': [...], 'removed': [...]} names since the last poll.
+
+        Covers changes made by other programs as well as through this store; cheap enough to
+        call every second when nothing changed.
+        """
+        return _no_changes()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonScenarioStore(ScenarioStore):
+    """All scenarios in one JSON file, the format the app has always used.
+
+    The whole file is parsed on open and rewritten on every change, so latency grows with
+    the number of scenarios; writes go to a temporary file that replaces the original, so
+    a crash mid-write never leaves a truncated file behind.
+
+    Other programs may edit the file at the same time: its mtime and size are checked
+    before every write and on poll(), and the file is re-read only when they changed, so
+    a save merges into the current file instead of overwriting the edits of others. A file
+    that does not parse raises ValueError on open and on writes, rather than being replaced.
+    """
+
+    def __init__(self, path=DEFAULT_SCENARIO_FILE):
+        self.path = path
+        self._scenarios = {}
+        self._stamp = None
+        self._version = 0
+        self._polled = ({}, 0)
+        self._sync()
+        self._polled = (dict(self._scenarios), self._version)
+
+    def __getitem__(self, name):
+        return self._scenarios[name]
+
+    def __setitem__(self, name, scenario):
+        self._sync()
+        self._scenarios[name] = scenario
+        self.save()
+
+    def __delitem__(self, name):
+        self._sync()
+        del self._scenarios[name]
+        self.save()
+
+    def __iter__(self):
+        return iter(self._scenarios)
+
+    def __len__(self):
+        return len(self._scenarios)
+
+    def save(self):
+        """Atomically rewrite the JSON file"""
+        write_json_atomic(self.path, self._scenarios)
+        self._stamp = _file_stamp(self.path)
+        self._version += 1
+
+    def poll(self):
+        self._sync(strict=False)
+        snapshot, version = self._polled
+        if version == self._version:
+            return _no_changes()
+        self._polled = (dict(self._scenarios), self._version)
+        return _diff(snapshot, self._scenarios)
+
+    def _sync(self, strict=True):
+        """Re-read the file if another program changed it since it was last read or written.
+
+        A file that does not parse raises ValueError, so that a corrupt file is reported on
+        open and never overwritten by a save. With strict=False (poll) it is skipped instead:
+        a non-atomic writer may have been caught mid-write, and the next check retries.
+        """
+        stamp = _file_stamp(self.path)
+        if stamp == self._stamp:
+            return
+        if stamp is None:
+            scenarios = {}
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    scenarios = json.load(f)
+                if not isinstance(scenarios, dict):
+                    raise ValueError("expected an object of named scenarios")
+            except ValueError as e:
+                if not strict:
+                    return
+                raise ValueError(f"Scenario file {self.path} is not valid: {e}") from e
+        self._scenarios = scenarios
+        self._stamp = stamp
+        self._version += 1
+
+
+class SqliteScenarioStore(ScenarioStore):
+    """Scenarios as rows of an SQLite table indexed on name and timestamp.
+
+    Names are listed without reading the scenario bodies, which are loaded on first access.
+    Every upsert or delete is its own transaction, so its cost does not depend on the number
+    of stored scenarios and an interrupted write leaves the database unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._bodies = {}
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS scenarios (name TEXT PRIMARY KEY, timestamp TEXT, body TEXT NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS scenarios_timestamp ON scenarios (timestamp)")
+        self._data_version = self._get_data_version()
+        self._timestamps = self.timestamps()
+        self._dirty = False
+
+    def __getitem__(self, name):
+        if name not in self._bodies:
+            row = self._connection.execute("SELECT body FROM scenarios WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                raise KeyError(name)
+            self._bodies[name] = json.loads(row[0])
+        return self._bodies[name]
+
+    def __setitem__(self, name, scenario):
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO scenarios (name, timestamp, body) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET timestamp = excluded.timestamp, body = excluded.body",
+                (name, scenario.get('timestamp'), json.dumps(scenario)))
+        self._bodies[name] = scenario
+        self._dirty = True
+
+    def __delitem__(self, name):
+        with self._connection:
+            deleted = self._connection.execute("DELETE FROM scenarios WHERE name = ?", (name,)).rowcount
+        self._bodies.pop(name, None)
+        self._dirty = True
+        if not deleted:
+            raise KeyError(name)
+
+    def __contains__(self, name):
+        return self._connection.execute("SELECT 1 FROM scenarios WHERE name = ?", (name,)).fetchone() is not None
+
+    def __iter__(self):
+        return (name for name, in self._connection.execute("SELECT name FROM scenarios ORDER BY name"))
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    def timestamps(self):
+        """{name: timestamp} of all scenarios, without loading their bodies"""
+        return dict(self._connection.execute("SELECT name, timestamp FROM scenarios"))
+
+    def poll(self):
+        """Changes by name and timestamp; PRAGMA data_version tells whether another connection wrote.
+
+        Rows rewritten by others with an unchanged timestamp are not reported.
+        """
+        data_version = self._get_data_version()
+        if data_version == self._data_version and not self._dirty:
+            return _no_changes()
+        self._data_version = data_version
+        self._dirty = False
+        timestamps = self.timestamps()
+        changes = _diff(self._timestamps, timestamps)
+        self._timestamps = timestamps
+        for name in changes['changed'] + changes['removed']:
+            self._bodies.pop(name, None)
+        return changes
+
+    def _get_data_version(self):
+        return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def import_json(self, json_path):
+        """Copy all scenarios of a JSON scenario file into the database in one transaction"""
+        with open(json_path, 'r') as f:
+            scenarios = json.load(f)
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO scenarios (name, timestamp, body) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET timestamp = excluded.timestamp, body = excluded.body",
+                [(name, scenario.get('timestamp'), json.dumps(scenario)) for name, scenario in scenarios.items()])
+        self._bodies.clear()
+        self._dirty = True
+        return len(scenarios)
+
+    def close(self):
+        self._connection.close()
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _no_changes():
+    return {'added': [], 'changed': [], 'removed': []}
+
+
+def _diff(old, new):
+    """Names added, changed and removed between two {name: scenario or timestamp} mappings"""
+    return {
+        'added': [name for name in new if name not in old],
+        'changed': [name for name in new if name in old and old[name] != new[name]],
+        'removed': [name for name in old if name not in new],
+    }
+
+
+def open_store(path=DEFAULT_SCENARIO_FILE):
+    """Open the scenario store at path, choosing the backend from the file extension"""
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteScenarioStore(path)
+    return JsonScenarioStore(path)
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON to a temporary file next to path and move it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a JSON scenario file into an SQLite scenario store")
+    parser.add_argument('json_file', nargs='?', default=DEFAULT_SCENARIO_FILE)
+    parser.add_argument('database', nargs='?', default='house_calc_scenarios.db')
+    args = parser.parse_args()
+
+    with SqliteScenarioStore(args.database) as store:
+        count = store.import_json(args.json_file)
+        print(f"Imported {count} scenarios into {args.database} ({len(store)} stored)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Check the vectorized engine against a plain period-by-period reference loop on random scenarios,
+including break-even months and scenarios with contract terms"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from house_calc_engine import (SCENARIO_KEYS, annuity_payment, compute_schedule, contract_terms, evaluate_batch,
+                               stack_scenarios)
+from house_calc_sensitivity import PARAMETER_RANGES
+
+
+def reference_schedule(scenario, tol=1e-6):
+    """Repayments, interest and payoff index of a scenario, one period at a time.
+
+    The balance grows by the interest of the period and shrinks by the annuity, plus the
+    special repayment at the end of every contract year and any extra_payments, together at
+    most special_repayment_cap per contract year. No annuity is paid during payment_holidays.
+    At each of rate_segments and at the end of each holiday the annuity is re-amortized over
+    the remaining term. The payment that clears the balance is reduced to what is left, and
+    nothing is paid afterwards.
+    """
+    raw_house_cost = float(scenario['raw_house_cost'])
+    loan_period = int(scenario['loan_period'])
+    periods_per_year = int(scenario.get('periods_per_year', 12))
+    loan_amount = raw_house_cost - float(scenario['down_payment'])
+    annual_rate = float(scenario['mortgage_rate'])
+    regular = annuity_payment(loan_amount, annual_rate, loan_period, periods_per_year)
+    yearly_repayment = raw_house_cost * float(scenario['yearly_repayment']) / 100.
+    cap = float(scenario.get('special_repayment_cap', np.inf))
+
+    n_periods = loan_period * periods_per_year
+    resets = {int(round(start_year * periods_per_year)): rate
+              for start_year, rate in scenario.get('rate_segments', ())}
+    extra = np.zeros(n_periods)
+    for year, amount in scenario.get('extra_payments', ()):
+        extra[max(int(np.ceil(year * periods_per_year)) - 1, 0)] += amount
+    holiday = np.zeros(n_periods, dtype=bool)
+    recasts = set()
+    for start_year, end_year in scenario.get('payment_holidays', ()):
+        last = int(round(end_year * periods_per_year))
+        holiday[int(round(start_year * periods_per_year)):last] = True
+        recasts.add(last)
+
+    repayments = np.zeros(n_periods)
+    interest_repayment = np.zeros(n_periods)
+    balance = loan_amount
+    payoff_idx = n_periods - 1
+    paid_this_year = 0.
+    for period in range(n_periods):
+        if balance <= tol:
+            break
+        if period in resets:
+            annual_rate = resets[period]
+        if period in resets or period in recasts:
+            regular = annuity_payment(balance, annual_rate, (n_periods - period) / periods_per_year, periods_per_year)
+        if period % periods_per_year == 0:
+            paid_this_year = 0.
+        special = extra[period] + (yearly_repayment if period % periods_per_year == periods_per_year - 1 else 0.)
+        special = min(special, cap - paid_this_year)
+        paid_this_year += special
+        interest = balance * annual_rate / periods_per_year / 100.
+        payment = (0. if holiday[period] else regular) + special
+        if balance + interest - payment <= tol:
+            payment = balance + interest
+            payoff_idx = period
+        balance = balance + interest - payment
+        repayments[period] = payment
+        interest_repayment[period] = interest
+    if loan_amount <= tol:
+        payoff_idx = 0
+    return repayments, interest_repayment, payoff_idx
+
+
+def reference_breakeven(scenario, repayments, interest_repayment, months=None):
+    """Squared distance between the money lost by buying and the rent saved, period by period.
+
+    months holds the time of each period in months, 1, 2, ... by default. The break-even
+    period is where this is smallest; returned whole so that near-ties can be judged against
+    a tolerance.
+    """
+    if months is None:
+        months = np.arange(1, len(repayments) + 1, dtype=float)
+    raw_house_cost = float(scenario['raw_house_cost'])
+    buy_cost_perc = sum(float(scenario[key]) for key in ('broker_commission', 'notary', 'land_registry',
+                                                         'land_transfer_tax')) / 100.
+    loan_amount = raw_house_cost - float(scenario['down_payment'])
+    upfront_costs = raw_house_cost * buy_cost_perc + float(scenario['down_payment'])
+    delta = np.zeros(len(repayments))
+    paid = principal = 0.
+    for period, t in enumerate(months):
+        paid += repayments[period]
+        principal += repayments[period] - interest_repayment[period]
+        inflation = (1 + float(scenario['inflation']) / 12. / 100.) ** t
+        house_valuation = raw_house_cost * (1 + float(scenario['house_inflation']) / 12. / 100.) ** t
+        profit = house_valuation - (loan_amount - principal) - (paid + upfront_costs)
+        rent_saved = t * (float(scenario['monthly_rent']) - float(scenario['nebenkosten'])) * inflation
+        delta[period] = (-profit - rent_saved) ** 2
+    return delta
+
+
+def random_scenarios(n, seed=0, contract_share=0.2):
+    """Scenarios drawn uniformly from the slider ranges, a share of them at the edge cases.
+
+    contract_share of them also get a rate reset and extra payments at random times, and
+    some of those a payment holiday, a cap on special repayments or a bi-weekly or weekly
+    resolution.
+    """
+    rng = np.random.default_rng(seed)
+    scenarios = []
+    for _ in range(n):
+        scenario = {key: rng.uniform(*PARAMETER_RANGES[key]) for key in SCENARIO_KEYS}
+        scenario['loan_period'] = int(rng.integers(10, 51))
+        edge = rng.integers(8)
+        if edge == 0:
+            scenario['mortgage_rate'] = 0.
+        elif edge == 1:
+            scenario['yearly_repayment'] = 0.
+        elif edge == 2:
+            scenario['down_payment'] = scenario['raw_house_cost'] * rng.uniform(0.95, 1.)
+        if rng.uniform() < contract_share:
+            loan_period = scenario['loan_period']
+            scenario['rate_segments'] = [[int(rng.integers(1, loan_period)), float(rng.uniform(0, 10))]]
+            scenario['extra_payments'] = [[float(rng.uniform(0.5, loan_period)), float(rng.uniform(0, 50000))]
+                                          for _ in range(int(rng.integers(1, 4)))]
+            if rng.uniform() < 0.5:
+                start_year = float(rng.uniform(0, loan_period - 2))
+                scenario['payment_holidays'] = [[start_year, start_year + float(rng.uniform(0.25, 2))]]
+            if rng.uniform() < 0.5:
+                scenario['special_repayment_cap'] = float(rng.uniform(0, 40000))
+            if rng.uniform() < 0.3:
+                scenario['periods_per_year'] = int(rng.choice([26, 52]))
+        scenarios.append(scenario)
+    return scenarios
+
+
+def verify(n=5000, seed=0, rtol=1e-9):
+    """Compare compute_schedule and evaluate_batch with the reference loop; returns the failures.
+
+    Scenarios with contract terms are checked against compute_schedule only, as
+    evaluate_batch computes the 13 inputs alone.
+    """
+    scenarios = random_scenarios(n, seed)
+    batch = evaluate_batch(stack_scenarios(scenarios))
+    failures = []
+    for i, scenario in enumerate(scenarios):
+        repayments, interest_repayment, payoff_idx = reference_schedule(scenario)
+        schedule = compute_schedule(scenario)
+        delta = reference_breakeven(scenario, repayments, interest_repayment, schedule.months)
+        atol = rtol * max(schedule.loan_amount, 1.)
+        problems = []
+        if schedule.payoff_idx != payoff_idx:
+            problems.append(f"payoff month {schedule.payoff_idx} != {payoff_idx}")
+        if not np.allclose(schedule.repayments, repayments, rtol=rtol, atol=atol):
+            problems.append(f"repayments differ by {np.abs(schedule.repayments - repayments).max():.3g}")
+        if not np.allclose(schedule.interest_repayment, interest_repayment, rtol=rtol, atol=atol):
+            problems.append(f"interest differs by {np.abs(schedule.interest_repayment - interest_repayment).max():.3g}")
+        if not _is_breakeven(delta, schedule.breakeven_idx, rtol):
+            problems.append(f"break-even period {schedule.breakeven_idx + 1} != {delta.argmin() + 1}")
+        if not contract_terms(scenario):
+            if batch['payoff_month'][i] != payoff_idx + 1:
+                problems.append(f"batch payoff month {batch['payoff_month'][i]} != {payoff_idx + 1}")
+            if not np.isclose(batch['total_interest'][i], interest_repayment.sum(), rtol=rtol, atol=atol):
+                problems.append(f"batch total interest {batch['total_interest'][i]:.6f} != "
+                                f"{interest_repayment.sum():.6f}")
+            if not _is_breakeven(delta, batch['breakeven_month'][i] - 1, rtol):
+                problems.append(f"batch break-even month {batch['breakeven_month'][i]} != {delta.argmin() + 1}")
+        if problems:
+            failures.append((scenario, problems))
+    return failures
+
+
+def _is_breakeven(delta, idx, rtol):
+    """Whether month idx is the minimum of delta, up to rounding (the distances are squared)"""
+    best = delta.min()
+    return delta[idx] <= best + max(np.sqrt(rtol) * best, 1e-6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the engine against a reference loop on random scenarios")
+    parser.add_argument('-n', '--scenarios', type=int, default=5000, help="Number of random scenarios")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rtol', type=float, default=1e-9, help="Relative tolerance, also scaled by the loan amount")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    failures = verify(args.scenarios, args.seed, args.rtol)
+    elapsed = time.perf_counter() - start
+    for scenario, problems in failures[:10]:
+        print(f"{'; '.join(problems)}: {scenario}", file=sys.stderr)
+    print(f"{args.scenarios - len(failures)}/{args.scenarios} scenarios match the reference loop ({elapsed:.1f}s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-import json
-import os
+import argparse
+import bisect
+from datetime import datetime, timezone
+
+from house_calc_instrumentation import Instrumentation, format_record
+from house_calc_scheduler import CoalescingScheduler
+from house_calc_store import DEFAULT_SCENARIO_FILE, open_store
+
+# NumPy, matplotlib and the engine are imported in finish_startup, after the window is shown
 
 class HouseCalculatorApp:
-    def __init__(self, root):
+    def __init__(self, root, debounce_ms=30, cache_size=128, scenario_file=DEFAULT_SCENARIO_FILE, instrument=False,
+                 watch_ms=1000):
         self.root = root
+        self.scenario_file = scenario_file
+        self.watch_ms = watch_ms
         self.root.title("House Cost Calculator")
         self.root.geometry("1700x1200")
 
@@ -16,6 +23,10 @@ class HouseCalculatorApp:
         self.saved_scenarios = {}
         self.current_scenario_name = tk.StringVar(value="Default")
         self.current_scenario_data = {}
+        # Keys of the loaded scenario beyond the inputs, such as contract terms: not editable
+        # here, but used in the calculation and kept when saving
+        self.scenario_extra = {}
+        self.contract_terms_display = tk.StringVar(value="")
 
         # Variables for sliders/inputs
         self.raw_house_cost = tk.DoubleVar(value=350000)
@@ -63,41 +74,89 @@ class HouseCalculatorApp:
         # # Log scale toggle
         self.log_scale = tk.BooleanVar(value=True)  #
 
+        # Timing instrumentation of updates and scenario I/O, shown in a status line
+        self.instrumentation = Instrumentation(enabled=instrument)
+        self.instrumentation.listeners.append(lambda record: self.timing_display.set(format_record(record)))
+        self.show_timing = tk.BooleanVar(value=instrument)
+        self.timing_display = tk.StringVar(value="")
+
+        # Problems with the scenario store found in the background, shown in a status line
+        self.store_status = tk.StringVar(value="")
+        self.store_error = None
 
         # Create main frames
         self.main_frame = ttk.Frame(self.root)
         self.main_frame.pack(fill=tk.BOTH, expand=True)
+        self.timing_label = ttk.Label(self.root, textvariable=self.timing_display, anchor=tk.W)
+        if instrument:
+            self.timing_label.pack(side=tk.BOTTOM, fill=tk.X, before=self.main_frame)
+        ttk.Label(self.root, textvariable=self.store_status, anchor=tk.W, foreground='red').pack(
+            side=tk.BOTTOM, fill=tk.X, before=self.main_frame)
 
         # Create input controls frame
         self.create_input_controls()
 
+        # Create scenario management controls
+        self.create_scenario_controls()
+
+        # Create info box
+        self.create_info_box()
+
+        # Load any saved scenarios
+        self.load_scenarios()
+
+        # Show the controls first; the figure and the engine are set up once the window is up
+        self.debounce_ms = debounce_ms
+        self.cache_size = cache_size
+        self.schedule_plot = None
+        self.sensitivity_window = None
+        self.portfolio_window = None
+        self.comparison_windows = []
+        self.load_listbox = None
+        self.root.after_idle(self.root.after, 1, self.finish_startup)
+
+    def finish_startup(self):
+        """Import the plotting and calculation modules, build the figure and draw the first plot"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        from house_calc_batch import SummaryCache
+        from house_calc_engine import ScheduleCache
+        from house_calc_plot import SchedulePlot
+
         # Create single figure with two subplots
-        self.figure = plt.figure(figsize=(12, 8))
-        self.ax1 = self.figure.add_subplot(2, 1, 1)  # Top subplot
-        self.ax2 = self.figure.add_subplot(2, 1, 2)  # Bottom subplot
-        self.ax1.sharex(self.ax2)  # Share x-axis
+        self.figure = Figure(figsize=(12, 8))
 
         # Create canvas for the figure
         self.canvas = FigureCanvasTkAgg(self.figure, master=self.main_frame)
         self.canvas.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
 
+        # Persistent plot artists, only their data changes on update
+        self.schedule_plot = SchedulePlot(self.figure)
+        self.ax1 = self.schedule_plot.ax1
+        self.ax2 = self.schedule_plot.ax2
+
         # Navigation toolbar
         self.toolbar = NavigationToolbar2Tk(self.canvas, self.main_frame)
         self.toolbar.update()
         self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
-        # Create scenario management controls
-        self.create_scenario_controls()
-
-        # Create info box
-        self.create_info_box()
+        # Computed schedules, so that view-only changes and revisited scenarios skip the math
+        self.schedule_cache = ScheduleCache(maxsize=self.cache_size)
+        # Summary rows of saved scenarios for the comparison table, evaluated in batches
+        self.summary_cache = SummaryCache()
 
-        # Load any saved scenarios
-        self.load_scenarios()
+        # Slider drags recompute in the background and only render the latest result
+        self.update_scheduler = CoalescingScheduler(
+            self.root, self.schedule_cache.get, lambda schedule: self.render_schedule(schedule, interactive=True),
+            debounce_ms=self.debounce_ms, on_error=self.report_update_error)
 
         # Initial plot
         self.update_plots()
 
+        # Pick up edits other programs make to the scenario store while the app is open
+        if self.watch_ms:
+            self.root.after(self.watch_ms, self.watch_scenarios)
+
     def create_scenario_controls(self):
         """Create controls for managing scenarios"""
         scenario_frame = ttk.LabelFrame(self.input_frame, text="Scenario Management", padding=10)
@@ -124,6 +183,15 @@ class HouseCalculatorApp:
         # Delete button
         ttk.Button(btn_frame, text="Delete", command=self.delete_scenario).pack(side=tk.LEFT, padx=5)
 
+        # Sensitivity button
+        ttk.Button(btn_frame, text="Sensitivity", command=self.open_sensitivity).pack(side=tk.LEFT, padx=5)
+
+        # Portfolio button
+        ttk.Button(btn_frame, text="Portfolio", command=self.open_portfolio).pack(side=tk.LEFT, padx=5)
+
+        # Clear the contract terms of a loaded scenario
+        ttk.Button(btn_frame, text="Clear terms", command=self.clear_contract_terms).pack(side=tk.LEFT, padx=5)
+
     def create_info_box(self):
         """Create a decorated box with vertically ordered labels"""
         self.info_box = ttk.LabelFrame(self.input_frame, text="Cost Summary", padding=(10, 5), relief=tk.RIDGE)
@@ -149,6 +217,8 @@ class HouseCalculatorApp:
         ttk.Label(self.info_box, textvariable=self.eff_house_cost_display, font=('Helvetica', fontsize, 'bold')).pack(
             anchor=tk.W,
             pady=2)
+        ttk.Label(self.info_box, textvariable=self.contract_terms_display, font=('Helvetica', fontsize - 3, 'italic'),
+                  wraplength=450).pack(anchor=tk.W, pady=2)
 
         # Separator
         ttk.Separator(self.info_box, orient='horizontal').pack(fill=tk.X, pady=5)
@@ -178,16 +248,29 @@ class HouseCalculatorApp:
             command=self.update_plots
         ).pack(side=tk.LEFT, padx=5)
 
-        # Frame for sliders
+        # Timing instrumentation controls
+        timing_frame = ttk.Frame(self.input_frame)
+        timing_frame.pack(pady=5)
+        ttk.Label(timing_frame, text="Timing:").pack(side=tk.LEFT)
+        ttk.Checkbutton(
+            timing_frame,
+            text="ON/OFF",
+            variable=self.show_timing,
+            command=self.toggle_timing
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Button(timing_frame, text="Profile", command=self.profile_update).pack(side=tk.LEFT, padx=5)
+        ttk.Button(timing_frame, text="Dump", command=self.dump_timings).pack(side=tk.LEFT, padx=5)
+
+        # Frame for entry fields
         self.entries_frame = ttk.Frame(self.input_frame)
-        self.entries_frame.pack(fill=tk.Y)
 
-        # Frame for entry fields (initially hidden)
+        # Frame for sliders
         self.sliders_frame = ttk.Frame(self.input_frame)
 
-        # Create both sliders and entries
-        self.create_entries()
-        self.create_sliders()
+        # Only the active input panel is built now, the other one on first use
+        self.entries_built = False
+        self.sliders_built = False
+        self.toggle_input_mode()
 
     def create_sliders(self):
         sliders = [
@@ -259,28 +342,68 @@ class HouseCalculatorApp:
 
     def toggle_input_mode(self):
         if self.input_mode.get() == "entries":
+            if not self.entries_built:
+                self.create_entries()
+                self.entries_built = True
             self.sliders_frame.pack_forget()
             self.entries_frame.pack(fill=tk.Y)
         else:
+            if not self.sliders_built:
+                self.create_sliders()
+                self.sliders_built = True
             self.entries_frame.pack_forget()
             self.sliders_frame.pack(fill=tk.Y)
+
+    def toggle_timing(self):
+        self.instrumentation.enabled = self.show_timing.get()
+        if self.instrumentation.enabled:
+            self.timing_label.pack(side=tk.BOTTOM, fill=tk.X, before=self.main_frame)
+        else:
+            self.timing_label.pack_forget()
+
+    def profile_update(self):
+        """Run one plot update under cProfile and save the statistics"""
+        enabled = self.instrumentation.enabled
+        self.instrumentation.enabled = True
+        self.instrumentation.profile_next('update_plots', 'house_calc_profile.prof')
         self.update_plots()
+        self.instrumentation.enabled = enabled
+        messagebox.showinfo("Profile", "Profile of one update saved to house_calc_profile.prof")
+
+    def dump_timings(self):
+        """Write the recorded timings to a JSON lines file"""
+        self.instrumentation.dump('house_calc_timings.jsonl')
+        messagebox.showinfo("Timings", f"{len(self.instrumentation.records)} timings saved to house_calc_timings.jsonl")
 
     def update_slider_display(self, var, display_var):
         display_var.set(f"{var.get():.1f}")
-        self.update_plots()
+        if self.schedule_plot is None:
+            return  # Still starting up, finish_startup draws the current inputs
+        self.update_scheduler.request(self.get_current_scenario_data())
 
     def update_from_entry(self, var, display_var):
+        """Apply a typed value if the whole scenario stays valid with it, otherwise restore the previous one"""
+        from house_calc_engine import SCENARIO_KEYS, compute_schedule
+
+        text = display_var.get()
         try:
-            value = float(display_var.get())
-            var.set(value)
-            self.update_plots()
-        except ValueError:
+            value = float(text)
+            # The input variables are named after the scenario keys
+            key = next(key for key in SCENARIO_KEYS if getattr(self, key) is var)
+            scenario = self.get_current_scenario_data()
+            scenario[key] = value
+            # Cached, so update_plots reuses the schedule
+            (compute_schedule if self.schedule_plot is None else self.schedule_cache.get)(scenario)
+        except ValueError as e:
             display_var.set(f"{var.get():.1f}")
+            messagebox.showerror("Error", f"'{text}' is not a valid value: {e}")
+            return
+        var.set(value)
+        self.update_plots()
 
     def get_current_scenario_data(self):
-        """Get all current input values as a dictionary"""
-        return {
+        """Get all current input values as a dictionary, with the extra keys of the loaded scenario"""
+        scenario = {
             'raw_house_cost': self.raw_house_cost.get(),
             'mortgage_rate': self.mortgage_rate.get(),
             'yearly_repayment': self.yearly_repayment.get(),
@@ -294,8 +417,10 @@ class HouseCalculatorApp:
             'land_registry': self.land_registry.get(),
             'land_transfer_tax': self.land_transfer_tax.get(),
             'monthly_rent': self.monthly_rent.get(),
-            'timestamp': str(np.datetime64('now'))
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
         }
+        scenario.update(self.scenario_extra)
+        return scenario
 
     def save_scenario(self):
         """Save current inputs as a named scenario"""
@@ -303,9 +428,16 @@ class HouseCalculatorApp:
         if not scenario_name:
             messagebox.showerror("Error", "Please enter a scenario name")
             return
+        if not self.store_available(f"save scenario '{scenario_name}'"):
+            return
 
-        self.saved_scenarios[scenario_name] = self.get_current_scenario_data()
-        self.save_scenarios_to_file()
+        try:
+            with self.instrumentation.measure('save_scenario') as timing:
+                self.saved_scenarios[scenario_name] = self.get_current_scenario_data()
+                timing.stage('write')
+        except Exception as e:
+            messagebox.showerror("Error", f"Scenario '{scenario_name}' was not saved: {e}")
+            return
         messagebox.showinfo("Saved", f"Scenario '{scenario_name}' saved successfully")
 
     def load_scenario_dialog(self):
@@ -324,6 +456,9 @@ class HouseCalculatorApp:
 
         for name in sorted(self.saved_scenarios.keys()):
             scenario_listbox.insert(tk.END, name)
+        # Kept up to date by scenarios_changed while the dialog is open
+        self.load_listbox = scenario_listbox
+        scenario_listbox.bind('<Destroy>', lambda e: setattr(self, 'load_listbox', None))
 
         def load_selected():
             selection = scenario_listbox.curselection()
@@ -340,41 +475,35 @@ class HouseCalculatorApp:
             messagebox.showerror("Error", f"Scenario '{scenario_name}' not found")
             return
 
-        scenario_data = self.saved_scenarios[scenario_name]
-
-        # Update all variables
-        self.raw_house_cost.set(scenario_data['raw_house_cost'])
-        self.mortgage_rate.set(scenario_data['mortgage_rate'])
-        self.yearly_repayment.set(scenario_data['yearly_repayment'])
-        self.nebenkosten.set(scenario_data['nebenkosten'])
-        self.inflation.set(scenario_data['inflation'])
-        self.house_inflation.set(scenario_data['house_inflation'])
-        self.loan_period.set(scenario_data['loan_period'])
-        self.down_payment.set(scenario_data['down_payment'])
-        self.broker_commission.set(scenario_data['broker_commission'])
-        self.notary.set(scenario_data['notary'])
-        self.land_registry.set(scenario_data['land_registry'])
-        self.land_transfer_tax.set(scenario_data['land_transfer_tax'])
-        self.monthly_rent.set(scenario_data['monthly_rent'])
-
-        # Update display variables
-        self.raw_house_cost_display.set(f"{scenario_data['raw_house_cost']:.1f}")
-        self.mortgage_rate_display.set(f"{scenario_data['mortgage_rate']:.1f}")
-        self.yearly_repayment_display.set(f"{scenario_data['yearly_repayment']:.1f}")
-        self.nebenkosten_display.set(f"{scenario_data['nebenkosten']:.1f}")
-        self.inflation_display.set(f"{scenario_data['inflation']:.1f}")
-        self.house_inflation_display.set(f"{scenario_data['house_inflation']:.1f}")
-        self.loan_period_display.set(f"{scenario_data['loan_period']:.1f}")
-        self.down_payment_display.set(f"{scenario_data['down_payment']:.1f}")
-        self.broker_commission_display.set(f"{scenario_data['broker_commission']:.1f}")
-        self.notary_display.set(f"{scenario_data['notary']:.1f}")
-        self.land_registry_display.set(f"{scenario_data['land_registry']:.1f}")
-        self.land_transfer_tax_display.set(f"{scenario_data['land_transfer_tax']:.1f}")
-        self.monthly_rent_display.set(f"{scenario_data['monthly_rent']:.1f}")
+        from house_calc_engine import SCENARIO_KEYS
+        from house_calc_scenario import Scenario
+        try:
+            scenario = Scenario.from_dict(self.saved_scenarios[scenario_name])
+        except ValueError as e:
+            messagebox.showerror("Error", f"Scenario '{scenario_name}' is invalid: {e}")
+            return
+
+        # The input variables and their displays are named after the scenario keys
+        for key in SCENARIO_KEYS:
+            getattr(self, key).set(scenario[key])
+            getattr(self, key + '_display').set(f"{scenario[key]:.1f}")
+        self.scenario_extra = dict(scenario.extra)
+        terms = scenario.contract_terms
+        self.contract_terms_display.set(
+            f"Contract terms: {', '.join(terms)} (included above and kept on save; edit them in the scenario "
+            f"file or remove them with Clear terms)" if terms else "")
 
         self.current_scenario_name.set(scenario_name)
         self.update_plots()
 
+    def clear_contract_terms(self):
+        """Drop the contract terms and other extra keys of the loaded scenario from the current inputs"""
+        if not self.scenario_extra:
+            return
+        self.scenario_extra = {}
+        self.contract_terms_display.set("")
+        self.update_plots()
+
     def delete_scenario(self):
         """Delete the currently loaded scenario"""
         scenario_name = self.current_scenario_name.get()
@@ -383,251 +512,529 @@ class HouseCalculatorApp:
             return
 
         if messagebox.askyesno("Confirm", f"Delete scenario '{scenario_name}'?"):
-            del self.saved_scenarios[scenario_name]
-            self.save_scenarios_to_file()
+            if not self.store_available(f"delete scenario '{scenario_name}'"):
+                return
+            try:
+                with self.instrumentation.measure('delete_scenario') as timing:
+                    del self.saved_scenarios[scenario_name]
+                    timing.stage('write')
+            except Exception as e:
+                messagebox.showerror("Error", f"Scenario '{scenario_name}' was not deleted: {e}")
+                return
             messagebox.showinfo("Deleted", f"Scenario '{scenario_name}' deleted")
             self.current_scenario_name.set("Default")
+            self.clear_contract_terms()
 
     def compare_scenarios(self):
-        """Compare multiple saved scenarios by showing their cost summaries side by side"""
+        """Open a table comparing the saved scenarios"""
         if len(self.saved_scenarios) < 2:
             messagebox.showinfo("Info", "Need at least 2 scenarios to compare")
             return
+        if self.schedule_plot is None:
+            return  # Still starting up
+        ComparisonWindow(self)
+
+    def open_sensitivity(self):
+        """Show the heatmap and tornado view of the current scenario"""
+        if self.schedule_plot is None:
+            return  # Still starting up
+        if self.sensitivity_window is None:
+            self.sensitivity_window = SensitivityWindow(self)
+        else:
+            self.sensitivity_window.window.lift()
+
+    def open_portfolio(self):
+        """Combine several saved scenarios, bought at different times, into one timeline"""
+        if self.schedule_plot is None:
+            return  # Still starting up
+        if self.portfolio_window is None:
+            self.portfolio_window = PortfolioWindow(self)
+        else:
+            self.portfolio_window.window.lift()
 
-        compare_window = tk.Toplevel(self.root)
-        compare_window.title("Compare Scenarios")
-        compare_window.geometry("1000x600")
-
-        # Main frame for comparison
-        main_frame = ttk.Frame(compare_window)
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        # Scenario selection frame
-        selection_frame = ttk.Frame(main_frame)
-        selection_frame.pack(fill=tk.X, pady=5)
-
-        ttk.Label(selection_frame, text="Select Scenarios:").pack(side=tk.LEFT)
-
-        scenario_vars = []
-        for name in sorted(self.saved_scenarios.keys()):
-            var = tk.BooleanVar(value=True)
-            scenario_vars.append((name, var))
-            ttk.Checkbutton(selection_frame, text=name, variable=var).pack(side=tk.LEFT, padx=5)
-
-        # Frame for cost summaries
-        summaries_frame = ttk.Frame(main_frame)
-        summaries_frame.pack(fill=tk.BOTH, expand=True)
-
-        def update_comparison():
-            # Clear previous summaries
-            for widget in summaries_frame.winfo_children():
-                widget.destroy()
-
-            selected_scenarios = [name for name, var in scenario_vars if var.get()]
-            if len(selected_scenarios) < 2:
-                messagebox.showerror("Error", "Select at least 2 scenarios to compare")
-                return
+    def load_scenarios(self, report=True):
+        """Open the scenario store (JSON file or SQLite database); scenarios are saved as they change.
 
-            # Create a frame for each scenario's summary
-            for i, scenario_name in enumerate(selected_scenarios):
-                scenario_data = self.saved_scenarios[scenario_name]
-
-                # Run calculations for this scenario
-                raw_house_cost = scenario_data['raw_house_cost']
-                mortgage_rate = scenario_data['mortgage_rate']
-                yearly_repayment_perc = scenario_data['yearly_repayment']
-                yearly_repayment = raw_house_cost * yearly_repayment_perc / 100.
-                loan_period = scenario_data['loan_period']
-                down_payment = scenario_data['down_payment']
-                broker_commission = scenario_data['broker_commission']
-                notary = scenario_data['notary']
-                land_registry = scenario_data['land_registry']
-                land_transfer_tax = scenario_data['land_transfer_tax']
-                nebenkosten = scenario_data["nebenkosten"]
-
-                # Calculate costs
-                buy_cost_perc = (broker_commission + notary + land_registry + land_transfer_tax) / 100.
-                misc_costs = raw_house_cost * buy_cost_perc
-                upfront_costs = misc_costs + down_payment
-                loan_amount = raw_house_cost - down_payment
-
-                monthly_repayment = loan_amount * (mortgage_rate / 100. / 12.) / (
-                        1 - (1 + mortgage_rate / 100. / 12) ** (-12 * loan_period))
-
-                # Calculate total interest
-                months = np.linspace(1, loan_period * 12, loan_period * 12)
-                repayments = [monthly_repayment] * len(months)
-                for j, m in enumerate(months):
-                    if m % 12 == 0:
-                        repayments[j] += yearly_repayment
-
-                interest_repayment = (loan_amount - np.cumsum(repayments)) * mortgage_rate / 12 / 100
-                interest_repayment[interest_repayment < 0] = 0
-                principle_repayment = np.array(repayments) - interest_repayment
-                principle_repayment[np.cumsum(principle_repayment) > loan_amount] = 0
-                total_repayment = interest_repayment + principle_repayment
-                extra_cost = misc_costs + max(np.cumsum(interest_repayment))
-
-                # Create summary frame for this scenario
-                scenario_frame = ttk.LabelFrame(summaries_frame, text=scenario_name, padding=10)
-                scenario_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-                # Add summary labels
-                fontsize=15
-                ttk.Label(scenario_frame, text=f"House Cost: ${raw_house_cost:,.2f}", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Down Payment: ${down_payment:,.2f}", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Loan Amount: ${loan_amount:,.2f}", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Mortgage Rate: {mortgage_rate:.2f}%", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Loan Period: {loan_period} years", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Monthly Repayment: ${monthly_repayment:,.2f} [{monthly_repayment + nebenkosten:,.2f}]", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Yearly Repayment: ${yearly_repayment:,.2f}", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Upfront Costs: ${upfront_costs:,.2f}", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Total Interest: ${max(np.cumsum(interest_repayment)):,.2f}", font=('Helvetica', fontsize)).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Effective house Cost: ${extra_cost + raw_house_cost:,.2f}", font=('Helvetica', fontsize, 'bold')).pack(anchor=tk.W, pady=2)
-                ttk.Label(scenario_frame, text=f"Extra Cost %: ${extra_cost:,.2f} [{extra_cost * 100 / raw_house_cost:.1f}%]", font=('Helvetica', fontsize, 'bold')).pack(anchor=tk.W, pady=2)
-
-        # Update button
-        update_button = ttk.Button(main_frame, text="Update Comparison", command=update_comparison)
-        update_button.pack(pady=5)
-
-        # Initial comparison
-        update_comparison()
-
-    def save_scenarios_to_file(self):
-        """Save scenarios to a JSON file"""
-        with open('house_calc_scenarios.json', 'w') as f:
-            json.dump(self.saved_scenarios, f, indent=2)
-
-    def load_scenarios(self):
-        """Load scenarios from a JSON file"""
-        if os.path.exists('house_calc_scenarios.json'):
-            try:
-                with open('house_calc_scenarios.json', 'r') as f:
-                    self.saved_scenarios = json.load(f)
-            except Exception as e:
+        Returns whether the store is open. After a failure saved_scenarios stays an empty dict
+        that is never written, store_error holds the reason, and saves, deletes and the
+        watcher retry the store before doing anything else.
+        """
+        try:
+            with self.instrumentation.measure('load_scenarios') as timing:
+                self.saved_scenarios = open_store(self.scenario_file)
+                timing.stage('open')
+        except Exception as e:
+            self.store_error = str(e)
+            self.store_status.set(f"Scenarios cannot be saved, {self.scenario_file} failed to open: {e}")
+            if report:
                 messagebox.showerror("Error", f"Failed to load scenarios: {str(e)}")
+            return False
+        self.store_error = None
+        self.store_status.set("")
+        return True
+
+    def store_available(self, action):
+        """Whether the scenario store is open, retrying it if it failed; explains why not"""
+        if self.store_error is None or self.load_scenarios(report=False):
+            return True
+        messagebox.showerror("Error", f"Cannot {action}: the scenario store {self.scenario_file} "
+                                      f"failed to open ({self.store_error})")
+        return False
+
+    def watch_scenarios(self):
+        """Poll the scenario store for changes (a stat of the file when nothing changed) and reschedule"""
+        if self.store_error is not None:
+            # Retry a store that failed to open; once it opens, all its scenarios are new
+            if self.load_scenarios(report=False):
+                self.scenarios_changed({'added': list(self.saved_scenarios), 'changed': [], 'removed': []})
+            self.root.after(self.watch_ms, self.watch_scenarios)
+            return
+        try:
+            changes = self.saved_scenarios.poll() if hasattr(self.saved_scenarios, 'poll') else None
+            self.store_status.set("")
+        except Exception as e:
+            changes = None
+            self.store_status.set(f"Failed to check the scenario store: {e}")
+        if changes and any(changes.values()):
+            with self.instrumentation.measure('reload_scenarios') as timing:
+                self.scenarios_changed(changes)
+                timing.stage('widgets')
+        self.root.after(self.watch_ms, self.watch_scenarios)
+
+    def scenarios_changed(self, changes):
+        """Bring open dialogs up to date with added, changed and removed scenarios.
+
+        The comparison table re-evaluates only the changed rows (SummaryCache), and cached
+        schedules are keyed on the inputs, so neither needs to be invalidated.
+        """
+        if self.load_listbox is not None:
+            names = list(self.load_listbox.get(0, tk.END))
+            for name in changes['removed']:
+                if name in names:
+                    self.load_listbox.delete(names.index(name))
+                    names.remove(name)
+            for name in sorted(changes['added']):
+                position = bisect.bisect(names, name)
+                self.load_listbox.insert(position, name)
+                names.insert(position, name)
+        for window in self.comparison_windows:
+            window.refresh()
+        if self.portfolio_window is not None:
+            self.portfolio_window.refresh()
 
     def update_plots(self):
-        # Get values from variables
-        raw_house_cost = self.raw_house_cost.get()
-        mortgage_rate = self.mortgage_rate.get()
-        monthly_rent = self.monthly_rent.get()
-        yearly_repayment_perc = self.yearly_repayment.get()
-        yearly_repayment = raw_house_cost * yearly_repayment_perc / 100.
-        nebenkosten = self.nebenkosten.get()
-        inflation = self.inflation.get()
-        house_inflation = self.house_inflation.get()
-        loan_period = self.loan_period.get()
-        down_payment = self.down_payment.get()
-        broker_commission = self.broker_commission.get()
-        notary = self.notary.get()
-        land_registry = self.land_registry.get()
-        land_transfer_tax = self.land_transfer_tax.get()
-
-        # Calculations
-        buy_cost_perc = (broker_commission + notary + land_registry + land_transfer_tax) / 100.
-        misc_costs = raw_house_cost * buy_cost_perc
-        upfront_costs = misc_costs + down_payment
-        loan_amount = raw_house_cost - down_payment
-
-        monthly_repayment = loan_amount * (mortgage_rate / 100. / 12.) / (
-                1 - (1 + mortgage_rate / 100. / 12) ** (-12 * loan_period))
+        if self.schedule_plot is None:
+            return  # Still starting up, finish_startup draws the current inputs
+        # A slider result still on its way is older than these inputs
+        self.update_scheduler.discard()
+        with self.instrumentation.measure('update_plots') as timing:
+            schedule = self.schedule_cache.get(self.get_current_scenario_data())
+            timing.stage('math')
+            self.render_schedule(schedule, timing=timing)
+
+    def report_update_error(self, error):
+        """Show why the schedule of the current inputs could not be computed in the background"""
+        messagebox.showerror("Error", f"The current inputs cannot be calculated: {error}")
+
+    def render_schedule(self, schedule, interactive=False, timing=None):
+        """Update the cost summary and both plots from a computed schedule.
+
+        interactive updates (slider drags) may keep the current axis limits and blit.
+        """
+        if timing is None:
+            with self.instrumentation.measure('render_schedule') as timing:
+                self.render_schedule(schedule, interactive, timing)
+            return
 
         # Update labels with better formatting
-        self.buying_cost_display.set(f"Buying Cost: ${misc_costs:,.2f}")
-        self.show_down_payment.set(f"Down Payment: ${down_payment:,.2f}")
-        self.show_yearly_payment.set(f"Yearly Payment: ${yearly_repayment:,.2f}")
-        self.loan_amount_display.set(f"Loan Amount: ${loan_amount:,.2f}")
-        self.monthly_repayment_display.set(f"Monthly Repayment: ${monthly_repayment:,.2f}")
-        self.upfront_costs_display.set(f"Upfront Costs: ${upfront_costs:,.2f}")
-
-        months = np.linspace(1, loan_period * 12, loan_period * 12)
-        repayments = [monthly_repayment] * len(months)
-        for i, m in enumerate(months):
-            if m % 12 == 0:
-                repayments[i] += yearly_repayment
-
-        interest_repayment = (loan_amount - np.cumsum(repayments)) * mortgage_rate / 12 / 100
-        interest_repayment[interest_repayment < 0] = 0
-        principle_repayment = np.array(repayments) - interest_repayment
-        principle_repayment[np.cumsum(principle_repayment) > loan_amount] = 0
-        while (max(np.cumsum(principle_repayment))-loan_amount)!=0:
-            idx=np.where(np.cumsum(principle_repayment)==max(np.cumsum(principle_repayment)))[0][0]
-            delta=abs(max(np.cumsum(principle_repayment))-loan_amount)
-            principle_repayment[idx+1] = min(delta,monthly_repayment)
-            # print(delta,principle_repayment[idx+1],monthly_repayment)
-
-        pcidx = idx+5*12 # When payment is complete
-        total_repayment = interest_repayment + principle_repayment
-        extra_cost = misc_costs + max(np.cumsum(interest_repayment))
+        self.buying_cost_display.set(f"Buying Cost: ${schedule.misc_costs:,.2f}")
+        self.show_down_payment.set(f"Down Payment: ${schedule.down_payment:,.2f}")
+        self.show_yearly_payment.set(f"Yearly Payment: ${schedule.yearly_repayment:,.2f}")
+        self.loan_amount_display.set(f"Loan Amount: ${schedule.loan_amount:,.2f}")
+        self.monthly_repayment_display.set(f"Monthly Repayment: ${schedule.monthly_repayment:,.2f}")
+        self.upfront_costs_display.set(f"Upfront Costs: ${schedule.upfront_costs:,.2f}")
         self.extra_costs_display.set(
-            f"Total Extra Cost: ${extra_cost:,.2f} ({extra_cost * 100 / raw_house_cost:.1f}% of house value)")
+            f"Total Extra Cost: ${schedule.extra_cost:,.2f} ({schedule.extra_cost_perc:.1f}% of house value)")
         self.eff_house_cost_display.set(
-            f"Effective house cost: ${extra_cost + raw_house_cost:,.2f}")
-
-        cumulative_rent = months * monthly_rent * ((1 + inflation / 12. / 100.) ** months)
-        house_valuation = raw_house_cost * ((1 + house_inflation / 12. / 100.) ** months)
-        other_costs = months * nebenkosten * ((1 + inflation / 12. / 100.) ** months)
-
-        owed_to_bank = loan_amount - np.cumsum(principle_repayment)
-        total_cumulative_costs = np.cumsum(total_repayment) + upfront_costs
-        profit = house_valuation - owed_to_bank - total_cumulative_costs
-
-        # Clear previous plots
-        self.ax1.clear()
-        self.ax2.clear()
-
-        # Update first subplot (House buying costs)
-        self.ax1.plot(months, np.cumsum(principle_repayment), lw=2, label='Principle Repayment')
-        self.ax1.plot(months, np.cumsum(interest_repayment), lw=2,
-                      label="Interest Repayment [" + str(round(max(np.cumsum(interest_repayment)), 0)) + "]")
-        self.ax1.plot(months, np.cumsum(principle_repayment) + np.cumsum(interest_repayment) + upfront_costs, lw=2,
-                      label="Principle + Interest + Misc. + Down payment")
-        self.ax1.plot(months, cumulative_rent, lw=2, label="Cumulative Rent")
-        self.ax1.plot(months, house_valuation, lw=2, label="House Valuation")
-        self.ax1.axhline(loan_amount, color="k", linestyle="--", label="Loan Amount")
-        self.ax1.axhline(raw_house_cost + misc_costs, color="m", linestyle="-", label="Practical house cost", lw=2)
-        self.ax1.axhline(raw_house_cost, color="c", linestyle="-.", label="Raw house cost", lw=1,alpha=0.7)
-        self.ax1.axhline(extra_cost, color="gray", linestyle="-", label="Extra house buying cost", lw=2)
-        self.ax1.plot(months, raw_house_cost - np.cumsum(principle_repayment) - down_payment   , lw=2, label="Pending loan amount")
-        self.ax1.set_title("House buying costs", fontsize=12)
-        self.ax1.legend(loc=0,ncol=2)
-        self.ax1.grid()
-        self.ax1.set_ylabel("Amount ($)", fontsize=10)
-        self.ax1.set_xlim(0,months[pcidx])
-        self.ax1.set_ylim(1e4, (raw_house_cost + extra_cost)*1.5)
-        if self.log_scale.get():
-            self.ax1.semilogy()
-        else:
-            self.ax1.set_yscale('linear')
-
-        # Update second subplot (House valuation vs Rent Analysis)
-        delta_min=((-profit) - (cumulative_rent - other_costs))**2
-        idx=np.where(delta_min==min(delta_min))[0][0]
-        self.ax2.plot(months, -profit, lw=2, label="Negative Profit = (House eval - owed_to_bank - cum. cost)")
-        self.ax2.plot(months, cumulative_rent - other_costs, lw=2, label="Cumulative Rent - Other Costs")
-        self.ax2.plot(months, cumulative_rent, lw=2, label="Cumulative Rent")
-        self.ax2.axhline(0, color="k", linestyle="--")
-        self.ax2.set_title("House valuation vs Rent Analysis", fontsize=12)
-        self.ax2.legend(loc='upper left')
-        self.ax2.grid()
-        self.ax2.set_ylim(-profit[idx]-(-profit[idx]*2),-profit[idx]+(-profit[idx]*2))
-        self.ax2.set_xlabel("Years", fontsize=10)
-        self.ax2.set_ylabel("Money lost ($)", fontsize=10)
-        self.ax2.set_xlim(0, months[pcidx])
-        # Set common x-axis ticks (only show years)
-        years = np.arange(1, loan_period + 1)
-        self.ax2.set_xticks(years * 12)
-        self.ax2.set_xticklabels(years)
-
-        # Adjust layout to prevent overlap
-        self.figure.tight_layout()
-
-        # Redraw canvas
-        self.canvas.draw()
+            f"Effective house cost: ${schedule.effective_cost:,.2f}")
+        timing.stage('labels')
+
+        self.schedule_plot.update(schedule, log_scale=self.log_scale.get(), blit=interactive, timing=timing)
+
+        if self.sensitivity_window is not None:
+            self.sensitivity_window.refresh(schedule.scenario)
+            timing.stage('sensitivity')
+
+
+class ComparisonWindow:
+    """Sortable, filterable table of the saved scenarios and an overlay of their cumulative costs.
+
+    The summary metrics of all scenarios come from one batch evaluation, cached per scenario
+    so that a refresh only evaluates new or changed ones; the Treeview only draws the rows
+    in view. The curves of the selected rows are overlaid in the plot below the table.
+    """
+
+    # Column, heading, width and format of the table
+    COLUMNS = (
+        ('name', "Scenario", 180, '{}'),
+        ('raw_house_cost', "House Cost", 100, '{:,.0f}'),
+        ('down_payment', "Down Payment", 100, '{:,.0f}'),
+        ('loan_amount', "Loan Amount", 100, '{:,.0f}'),
+        ('mortgage_rate', "Rate (%)", 70, '{:.2f}'),
+        ('loan_period', "Years", 50, '{}'),
+        ('monthly_repayment', "Monthly", 90, '{:,.2f}'),
+        ('monthly_total', "Monthly + Other", 110, '{:,.2f}'),
+        ('yearly_repayment', "Yearly", 90, '{:,.0f}'),
+        ('upfront_costs', "Upfront Costs", 100, '{:,.0f}'),
+        ('total_interest', "Total Interest", 100, '{:,.0f}'),
+        ('effective_cost', "Effective Cost", 110, '{:,.0f}'),
+        ('extra_cost_perc', "Extra Cost (%)", 100, '{:.1f}'),
+        ('breakeven_year', "Break-even (y)", 100, '{:.1f}'),
+    )
+
+    def __init__(self, app):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from house_calc_plot import ComparisonPlot
+
+        self.app = app
+        self.rows = {}
+        self.sort_column = 'name'
+        self.sort_descending = False
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Compare Scenarios")
+        # Refreshed by the app when the scenario store changes on disk
+        app.comparison_windows.append(self)
+        self.window.bind('<Destroy>', self._on_destroy)
+        self.window.geometry("1500x900")
+        main_frame = ttk.Frame(self.window)
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        # Filters: name substring and a range of one column
+        self.name_filter = tk.StringVar()
+        self.range_column = tk.StringVar(value='effective_cost')
+        self.range_min = tk.StringVar()
+        self.range_max = tk.StringVar()
+        self.count_display = tk.StringVar()
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(filter_frame, text="Name contains:").pack(side=tk.LEFT)
+        name_entry = ttk.Entry(filter_frame, textvariable=self.name_filter, width=20)
+        name_entry.pack(side=tk.LEFT, padx=5)
+        name_entry.bind("<KeyRelease>", lambda e: self.show_rows())
+        ttk.Combobox(filter_frame, textvariable=self.range_column, values=[column for column, *_ in self.COLUMNS[1:]],
+                     state='readonly', width=18).pack(side=tk.LEFT, padx=5)
+        for label, var in (("from", self.range_min), ("to", self.range_max)):
+            ttk.Label(filter_frame, text=label).pack(side=tk.LEFT)
+            entry = ttk.Entry(filter_frame, textvariable=var, width=12)
+            entry.pack(side=tk.LEFT, padx=5)
+            entry.bind("<Return>", lambda e: self.show_rows())
+        ttk.Button(filter_frame, text="Filter", command=self.show_rows).pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text="Refresh", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, textvariable=self.count_display).pack(side=tk.LEFT, padx=10)
+
+        # Table
+        table_frame = ttk.Frame(main_frame)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        columns = [column for column, *_ in self.COLUMNS]
+        self.tree = ttk.Treeview(table_frame, columns=columns, show='headings', selectmode='extended')
+        for column, heading, width, _ in self.COLUMNS:
+            self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, anchor=tk.W if column == 'name' else tk.E)
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind('<<TreeviewSelect>>', lambda e: self.update_overlay())
+
+        # Overlay of the selected scenarios
+        self.figure = Figure(figsize=(14, 4))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=main_frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.plot = ComparisonPlot(self.figure)
+
+        self.refresh()
+        # Overlay the first few scenarios to start with
+        self.tree.selection_set(self.tree.get_children()[:ComparisonPlot.MAX_LEGEND])
+
+    def refresh(self):
+        """Re-read the saved scenarios; only new or changed ones are evaluated"""
+        with self.app.instrumentation.measure('update_comparison') as timing:
+            scenarios = {name: self.app.saved_scenarios[name] for name in self.app.saved_scenarios}
+            self.rows = self.app.summary_cache.rows(scenarios)
+            for name, row in self.rows.items():
+                row['monthly_total'] = row['monthly_repayment'] + float(scenarios[name]['nebenkosten'])
+                row['breakeven_year'] = row['breakeven_month'] / 12.
+            timing.stage('math')
+            self.show_rows()
+            timing.stage('widgets')
+
+    def show_rows(self):
+        """Fill the table with the rows passing the filters, in the current sort order"""
+        name_filter = self.name_filter.get().lower()
+        column = self.range_column.get()
+        try:
+            low = float(self.range_min.get()) if self.range_min.get().strip() else -float('inf')
+            high = float(self.range_max.get()) if self.range_max.get().strip() else float('inf')
+        except ValueError:
+            messagebox.showerror("Error", "Range limits must be numbers", parent=self.window)
+            return
+
+        rows = [row for name, row in self.rows.items()
+                if name_filter in name.lower() and low <= row[column] <= high]
+        rows.sort(key=lambda row: row[self.sort_column], reverse=self.sort_descending)
+
+        selected = set(self.tree.selection())
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert('', tk.END, iid=row['name'],
+                             values=[fmt.format(row[column]) for column, _, _, fmt in self.COLUMNS])
+        self.tree.selection_set([row['name'] for row in rows if row['name'] in selected])
+        self.count_display.set(f"Showing {len(rows)} of {len(self.rows)} scenarios")
+        self.update_overlay()
+
+    def sort_by(self, column):
+        """Sort by a column; sorting by the same column again reverses the order"""
+        self.sort_descending = not self.sort_descending if column == self.sort_column else False
+        self.sort_column = column
+        self.show_rows()
+
+    def _on_destroy(self, event):
+        if event.widget is self.window and self in self.app.comparison_windows:
+            self.app.comparison_windows.remove(self)
+
+    def update_overlay(self):
+        with self.app.instrumentation.measure('comparison_overlay') as timing:
+            names = list(self.tree.selection())
+            schedules = [self.app.schedule_cache.get(self.app.saved_scenarios[name]) for name in names]
+            timing.stage('math')
+            self.plot.update(names, schedules)
+            self.canvas.draw_idle()
+            timing.stage('draw')
+
+
+class PortfolioWindow:
+    """Saved scenarios combined into one portfolio, each bought in its own start month.
+
+    The selected rows of the table make up the portfolio; their combined outflow, debt,
+    equity and break-even are recomputed as one batch (house_calc_portfolio) whenever the
+    selection, a start month or the scenario store changes. Start months are kept for the
+    session only.
+    """
+
+    def __init__(self, app):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        from house_calc_plot import PortfolioPlot
+
+        self.app = app
+        self.start_months = {}
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Portfolio")
+        self.window.geometry("1500x900")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        left = ttk.Frame(self.window, padding=5)
+        left.pack(side=tk.LEFT, fill=tk.Y)
+        self.tree = ttk.Treeview(left, columns=('name', 'start'), show='headings', selectmode='extended', height=25)
+        self.tree.heading('name', text="Scenario")
+        self.tree.heading('start', text="Start month")
+        self.tree.column('name', width=200)
+        self.tree.column('start', width=90, anchor=tk.E)
+        self.tree.pack(fill=tk.Y, expand=True)
+        self.tree.bind('<<TreeviewSelect>>', lambda e: self.update())
+
+        # Start month of the selected rows
+        self.start_month = tk.StringVar(value='0')
+        start_frame = ttk.Frame(left)
+        start_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(start_frame, text="Start month:").pack(side=tk.LEFT)
+        start_entry = ttk.Entry(start_frame, textvariable=self.start_month, width=8)
+        start_entry.pack(side=tk.LEFT, padx=5)
+        start_entry.bind("<Return>", lambda e: self.set_start())
+        ttk.Button(start_frame, text="Set for selected", command=self.set_start).pack(side=tk.LEFT)
+
+        self.summary = tk.StringVar(value="Select the scenarios of the portfolio")
+        ttk.Label(left, textvariable=self.summary, justify=tk.LEFT).pack(fill=tk.X, pady=5)
+
+        self.figure = Figure(figsize=(12, 8))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.window)
+        self.toolbar.update()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.plot = PortfolioPlot(self.figure)
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the scenario names, keeping the selection and start months"""
+        selected = set(self.tree.selection())
+        names = sorted(self.app.saved_scenarios)
+        self.tree.delete(*self.tree.get_children())
+        for name in names:
+            self.tree.insert('', tk.END, iid=name, values=(name, self.start_months.get(name, 0)))
+        self.tree.selection_set([name for name in names if name in selected])
+        self.update()
+
+    def set_start(self):
+        try:
+            start_month = int(self.start_month.get())
+            if start_month < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "The start month must be a whole number of months, 0 or more",
+                                 parent=self.window)
+            return
+        for name in self.tree.selection():
+            self.start_months[name] = start_month
+            self.tree.set(name, 'start', start_month)
+        self.update()
+
+    def update(self):
+        from house_calc_portfolio import compute_portfolio
+
+        with self.app.instrumentation.measure('update_portfolio') as timing:
+            names = list(self.tree.selection())
+            portfolio = None
+            if names:
+                try:
+                    portfolio = compute_portfolio([(name, self.app.saved_scenarios[name], self.start_months.get(name, 0))
+                                                   for name in names])
+                except ValueError as e:
+                    self.summary.set(str(e))
+            timing.stage('math')
+            self.plot.update(portfolio)
+            if portfolio is not None:
+                years = portfolio.months / 12.
+                self.summary.set(
+                    f"{len(portfolio)} properties over {years[-1]:.1f} years\n"
+                    f"Peak monthly outflow: ${portfolio.peak_outflow:,.0f}\n"
+                    f"Peak debt: ${portfolio.peak_debt:,.0f}\n"
+                    f"Debt-free in year {years[portfolio.payoff_idx]:.1f}\n"
+                    f"Total interest: ${portfolio.total_interest:,.0f}\n"
+                    f"Equity at the end: ${portfolio.equity[-1]:,.0f}\n"
+                    f"Break-even vs. renting: year {years[portfolio.breakeven_idx]:.1f}")
+            elif not names:
+                self.summary.set("Select the scenarios of the portfolio")
+            self.canvas.draw_idle()
+            timing.stage('draw')
+
+    def close(self):
+        self.window.destroy()
+        self.app.portfolio_window = None
+
+
+class SensitivityWindow:
+    """Heatmap of a metric over two chosen inputs and tornado bars of all inputs.
+
+    Follows the current scenario of the app: the tornado bars (27 scenarios) are recomputed
+    on every update, while the heatmap grid is recomputed on a worker thread only when an
+    input other than its two axes changes, first at a coarse preview resolution and then at
+    full resolution. Otherwise only the marker of the current scenario moves.
+    """
+
+    PREVIEW_RESOLUTION = 50
+
+    def __init__(self, app):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from house_calc_plot import SensitivityPlot
+        from house_calc_sensitivity import PARAMETER_RANGES, SENSITIVITY_METRICS
+
+        self.app = app
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Sensitivity")
+        self.window.geometry("1500x700")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.x_parameter = tk.StringVar(value='mortgage_rate')
+        self.y_parameter = tk.StringVar(value='down_payment')
+        self.metric = tk.StringVar(value='effective_cost')
+        self.resolution = tk.StringVar(value='200')
+
+        controls = ttk.Frame(self.window, padding=5)
+        controls.pack(fill=tk.X)
+        for label, var, values in (("X axis:", self.x_parameter, list(PARAMETER_RANGES)),
+                                   ("Y axis:", self.y_parameter, list(PARAMETER_RANGES)),
+                                   ("Metric:", self.metric, list(SENSITIVITY_METRICS)),
+                                   ("Resolution:", self.resolution, ['50', '100', '200', '400'])):
+            ttk.Label(controls, text=label).pack(side=tk.LEFT, padx=5)
+            combobox = ttk.Combobox(controls, textvariable=var, values=values, state='readonly', width=18)
+            combobox.pack(side=tk.LEFT)
+            combobox.bind('<<ComboboxSelected>>', lambda e: self.refresh())
+
+        self.figure = Figure(figsize=(15, 6))
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.plot = SensitivityPlot(self.figure)
+
+        self.heatmap_scheduler = CoalescingScheduler(app.root, self.compute_heatmap, self.apply_heatmap,
+                                                     debounce_ms=app.debounce_ms, on_error=app.report_update_error)
+        self.preview_scheduler = CoalescingScheduler(app.root, self.compute_heatmap, self.apply_heatmap,
+                                                     debounce_ms=app.debounce_ms, on_error=app.report_update_error)
+        self._requested_key = None  # heatmap_key of the latest requested grid
+        self._shown_key = None  # heatmap_key and resolution of the grid on screen
+        self._shown_resolution = 0
+        self.refresh()
+
+    def refresh(self, scenario=None):
+        """Follow a new current scenario, or changed settings if scenario is None"""
+        from house_calc_sensitivity import heatmap_key, tornado
+
+        if scenario is None:
+            scenario = self.app.get_current_scenario_data()
+        x_parameter = self.x_parameter.get()
+        y_parameter = self.y_parameter.get()
+        metric = self.metric.get()
+        resolution = int(self.resolution.get())
+
+        self.plot.update_tornado(tornado(scenario, metric), metric)
+        self.plot.update_marker(scenario[x_parameter], scenario[y_parameter])
+        key = heatmap_key(scenario, x_parameter, y_parameter, metric, resolution)
+        if x_parameter != y_parameter and key != self._requested_key:
+            self._requested_key = key
+            if resolution > self.PREVIEW_RESOLUTION:
+                self.preview_scheduler.request((key, scenario, self.PREVIEW_RESOLUTION))
+            self.heatmap_scheduler.request((key, scenario, resolution))
+        self.canvas.draw_idle()
+
+    def compute_heatmap(self, args):
+        # Runs on a scheduler worker thread, so it must not touch Tk
+        from house_calc_sensitivity import axis_values, heatmap
+
+        key, scenario, resolution = args
+        x_parameter, y_parameter, metric = key[:3]
+        x_values = axis_values(x_parameter, resolution)
+        y_values = axis_values(y_parameter, resolution)
+        return key, resolution, x_values, y_values, heatmap(scenario, x_parameter, x_values, y_parameter, y_values, metric)
+
+    def apply_heatmap(self, result):
+        key, resolution, x_values, y_values, grid = result
+        # Drop results of superseded settings and previews arriving after the full grid
+        if key != self._requested_key or (key == self._shown_key and resolution <= self._shown_resolution):
+            return
+        x_parameter, y_parameter, metric = key[:3]
+        self.plot.update_heatmap(grid, x_parameter, x_values, y_parameter, y_values, metric)
+        self._shown_key = key
+        self._shown_resolution = resolution
+        self.canvas.draw_idle()
+
+    def close(self):
+        self.heatmap_scheduler.close()
+        self.preview_scheduler.close()
+        self.window.destroy()
+        self.app.sensitivity_window = None
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="House Cost Calculator")
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIO_FILE,
+                        help="Scenario file (.json) or database (.db, .sqlite)")
+    parser.add_argument('--timing', action='store_true', help="Record and show per-stage update timings")
+    parser.add_argument('--watch-ms', type=int, default=1000,
+                        help="Interval for checking the scenario store for outside changes (0 to disable)")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = HouseCalculatorApp(root)
+    app = HouseCalculatorApp(root, scenario_file=args.scenarios, instrument=args.timing, watch_ms=args.watch_ms)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,13 @@
+"""Engine against the reference loop of house_calc_verify, run by pytest"""
+from house_calc_verify import random_scenarios, verify
+
+
+def test_random_scenarios_cover_contract_terms():
+    scenarios = random_scenarios(300, seed=0)
+    for key in ('rate_segments', 'extra_payments', 'payment_holidays', 'special_repayment_cap', 'periods_per_year'):
+        assert any(key in scenario for scenario in scenarios), key
+
+
+def test_engine_matches_reference_loop():
+    failures = verify(n=300, seed=0)
+    assert not failures, '\n'.join(f"{'; '.join(problems)}: {scenario}" for scenario, problems in failures[:5])